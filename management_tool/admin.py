@@ -1,3 +1,11 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import ExportJob
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'eligible', 'status', 'created_at',
+                    'finished_at']
+    list_filter = ['status']
+    raw_id_fields = ['user']
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ManagementToolConfig(AppConfig):
     name = 'management_tool'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,100 @@
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# gzip levels and brotli qualities used on responses, lower than the
+# maximum since responses are compressed on every request
+LEVELS = {'br': 4, 'gzip': 6}
+# used for files compressed once, such as the collected static files
+MAX_LEVELS = {'br': 11, 'gzip': 9}
+# file name suffixes of compressed files, in order of preference
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def accepted_encodings(accept_encoding):
+    """Return the content codings an Accept-Encoding header allows."""
+    accepted = set()
+    for coding in accept_encoding.split(','):
+        coding, _, params = coding.strip().partition(';')
+        params = params.replace(' ', '')
+        if coding and params not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(coding.lower())
+    return accepted
+
+
+def get_encodings():
+    """Return the supported content codings in order of preference."""
+    if brotli is None:
+        return ('gzip',)
+    return ('br', 'gzip')
+
+
+def choose_encoding(accept_encoding):
+    """Return the preferred coding an Accept-Encoding header allows."""
+    accepted = accepted_encodings(accept_encoding)
+    for encoding in get_encodings():
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+class GzipCompressor:
+    """Write a gzip stream, its header has no timestamp."""
+
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED,
+                                           16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+
+class BrotliCompressor:
+
+    def __init__(self, level):
+        self.compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.finish()
+
+
+COMPRESSORS = {
+    'br': BrotliCompressor,
+    'gzip': GzipCompressor,
+}
+
+
+def get_compressor(encoding, level=None):
+    if level is None:
+        level = LEVELS[encoding]
+    return COMPRESSORS[encoding](level)
+
+
+def compress(data, encoding, level=None):
+    """Return bytes compressed with a content coding."""
+    compressor = get_compressor(encoding, level)
+    return compressor.compress(data) + compressor.flush()
+
+
+def iter_compress(chunks, encoding, level=None):
+    """Compress a stream of byte chunks as it is produced.
+
+    Only what the compressor has output is yielded, so small chunks are
+    gathered into larger blocks instead of each becoming a flushed block,
+    and nothing is held back beyond the compressor's own window.
+    """
+    compressor = get_compressor(encoding, level)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
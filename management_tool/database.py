@@ -0,0 +1,29 @@
+import sqlite3
+
+from django.conf import settings
+
+
+def get_pragma_statements(pragmas):
+    """Return the PRAGMA statements setting the given values."""
+    return ['PRAGMA {} = {}'.format(name, value)
+            for name, value in pragmas.items()]
+
+
+def apply_pragmas(cursor, pragmas=None):
+    """Run the PRAGMA statements of SQLITE_PRAGMAS, or the given ones."""
+    if pragmas is None:
+        pragmas = settings.SQLITE_PRAGMAS
+    for statement in get_pragma_statements(pragmas):
+        cursor.execute(statement)
+
+
+def connect(path, pragmas=None, timeout=0):
+    """Open a plain sqlite3 connection set up like the Django ones.
+
+    Used by benchmarks that need many connections outside of Django.
+    """
+    connection = sqlite3.connect(path, timeout=timeout,
+                                 check_same_thread=False,
+                                 isolation_level=None)
+    apply_pragmas(connection, pragmas)
+    return connection
@@ -0,0 +1,226 @@
+import csv
+import datetime
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import compression, routers
+from .models import ExportJob
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+# number of rows fetched from the database at a time by the csv export
+EXPORT_CHUNK_SIZE = 2000
+# formats of the user list export and their content types
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'csv.gz': 'application/gzip',
+    'ndjson': 'application/x-ndjson',
+    'ndjson.gz': 'application/gzip',
+}
+EXPORT_COMPRESS_LEVEL = 6
+
+executor = ThreadPoolExecutor(max_workers=settings.EXPORT_JOB_WORKERS,
+                              thread_name_prefix='export')
+
+
+class Echo:
+    """An object that implements just the write method of the file-like
+    interface, so csv.writer hands each row back instead of buffering it.
+    """
+
+    def write(self, value):
+        """Write the value by returning it, instead of storing in a buffer."""
+        return value
+
+
+def get_active_users(eligible=None, search=None):
+    """Return active non-staff users annotated with their eligibility.
+
+    The birth date cutoff is computed once, so Allowed/Blocked filtering
+    and labels are both resolved by the database.
+    """
+    today = datetime.date.today()
+    user_list = User.objects.filter(is_staff=False,
+                                    is_active=True).with_eligibility(today)
+    if eligible:
+        user_list = user_list.eligible(eligible, today)
+    if search:
+        user_list = user_list.search(search)
+    return user_list
+
+
+def get_export_rows(eligible=None):
+    """Return the exported columns of active users, read in chunks."""
+    return get_active_users(eligible).values_list(
+        'username', 'birth_date', 'eligible', 'random_number',
+        'bizz_fuzz').iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def get_export_file_name(date, export_format='csv'):
+    """Return the name of a user list export made on the given date."""
+    return '{date}_user_list.{format}'.format(date=date.strftime('%b-%d-%Y'),
+                                              format=export_format)
+
+
+def iter_user_csv_rows(user_list):
+    """Yield the export header and one CSV-formatted line per user."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(['Username', 'Birthday', 'Eligible',
+                           'Random Number', 'BizzFuzz'])
+    for username, birth_date, eligible, random_number, category in user_list:
+        yield writer.writerow([
+            username,
+            birth_date,
+            eligible,
+            random_number,
+            category or random_number
+        ])
+
+
+def iter_user_ndjson_rows(user_list):
+    """Yield one JSON object per user, each on its own line."""
+    encoder = DjangoJSONEncoder()
+    for username, birth_date, eligible, random_number, category in user_list:
+        yield encoder.encode({
+            'username': username,
+            'birth_date': birth_date,
+            'eligible': eligible,
+            'random_number': random_number,
+            'bizz_fuzz': category or random_number,
+        }) + '\n'
+
+
+def iter_user_export(user_list, export_format='csv'):
+    """Yield the user list export in one of the EXPORT_FORMATS."""
+    if export_format.startswith('ndjson'):
+        chunks = iter_user_ndjson_rows(user_list)
+    else:
+        chunks = iter_user_csv_rows(user_list)
+    if export_format.endswith('.gz'):
+        chunks = compression.iter_compress(
+            (chunk.encode('utf-8') for chunk in chunks), 'gzip',
+            EXPORT_COMPRESS_LEVEL)
+    return chunks
+
+
+def queue_export_job(job):
+    """Hand a saved export job to the worker pool once it is committed."""
+    transaction.on_commit(lambda: executor.submit(run_export_job, job.pk))
+
+
+def get_export_job_file_name(job_pk):
+    return 'user_list_{}.csv'.format(job_pk)
+
+
+def get_partial_path(job_pk):
+    """Return the path an export job writes to until it is done."""
+    return os.path.join(settings.EXPORT_ROOT,
+                        get_export_job_file_name(job_pk) + '.part')
+
+
+def remove_partial_file(job_pk):
+    try:
+        os.remove(get_partial_path(job_pk))
+    except FileNotFoundError:
+        pass
+
+
+def get_stale_condition():
+    """Return the condition of running jobs whose process most likely died.
+
+    A job running for longer than EXPORT_JOB_TIMEOUT is not expected to
+    finish anymore. Jobs started before started_at existed are timed from
+    their creation.
+    """
+    cutoff = timezone.now() - datetime.timedelta(
+        seconds=settings.EXPORT_JOB_TIMEOUT)
+    return Q(status=ExportJob.RUNNING) & (
+        Q(started_at__lt=cutoff) |
+        Q(started_at__isnull=True, created_at__lt=cutoff))
+
+
+def get_stale_export_jobs():
+    return ExportJob.objects.filter(get_stale_condition())
+
+
+def reset_stale_export_jobs():
+    """Put stale running jobs back in the queue, without their partial file.
+
+    The reset is conditional on the job being stale still, so a job that
+    just finished keeps its result.
+    """
+    reset = 0
+    for job_pk in get_stale_export_jobs().values_list('pk', flat=True):
+        if get_stale_export_jobs().filter(pk=job_pk).update(
+                status=ExportJob.PENDING, started_at=None):
+            remove_partial_file(job_pk)
+            reset += 1
+    return reset
+
+
+def run_export_job(job_pk):
+    """Write the CSV file of a pending export job.
+
+    The job is claimed with a conditional update, so a job picked up by
+    both the worker pool and the run_export_jobs command runs only once.
+    """
+    try:
+        claimed = ExportJob.objects.filter(
+            pk=job_pk, status=ExportJob.PENDING).update(
+                status=ExportJob.RUNNING, started_at=timezone.now())
+        if not claimed:
+            return
+        job = ExportJob.objects.get(pk=job_pk)
+        job.file_name = get_export_job_file_name(job.pk)
+        os.makedirs(settings.EXPORT_ROOT, exist_ok=True)
+        partial_path = get_partial_path(job.pk)
+        try:
+            with open(partial_path, 'w', newline='') as csv_file:
+                csv_file.writelines(
+                    iter_user_csv_rows(get_export_rows(job.eligible)))
+            os.replace(partial_path, job.path)
+        except Exception as e:
+            logger.exception('Export job %s failed', job.pk)
+            remove_partial_file(job.pk)
+            job.status = ExportJob.FAILED
+            job.file_name = ''
+            job.error = str(e)
+        else:
+            job.status = ExportJob.DONE
+        job.finished_at = timezone.now()
+        job.save()
+    finally:
+        # worker threads own their connections and their router pin,
+        # release them with the job
+        routers.unpin()
+        if not connection.in_atomic_block:
+            connections.close_all()
+
+
+def delete_expired_export_jobs():
+    """Delete export jobs and files older than the retention period.
+
+    Running jobs are kept unless they are stale, their process died.
+    """
+    expired = ExportJob.objects.filter(
+        ~Q(status=ExportJob.RUNNING) | get_stale_condition(),
+        created_at__lt=timezone.now() - datetime.timedelta(
+            seconds=settings.EXPORT_JOB_RETENTION))
+    deleted = 0
+    for job in expired.iterator():
+        if job.file_name and os.path.exists(job.path):
+            os.remove(job.path)
+        remove_partial_file(job.pk)
+        job.delete()
+        deleted += 1
+    return deleted
@@ -0,0 +1,47 @@
+import datetime
+
+from django.core.cache import caches
+from django.utils.safestring import mark_safe
+
+from .renderers import UserRowRenderer
+
+# rows are keyed by date, so they are never needed past a day
+ROW_TIMEOUT = 24 * 60 * 60
+
+
+def get_cache():
+    return caches['user_rows']
+
+
+def get_row_key(user, today):
+    """Return the cache key of a user row.
+
+    The row's updated_at versions the key, so a change made through any
+    worker process is seen by all of them without invalidation. The date
+    is part of the key because eligibility changes with it.
+    """
+    return 'user_row:{}:{}:{}'.format(today.isoformat(), user.pk,
+                                      user.updated_at.isoformat())
+
+
+def render_user_rows(user_list):
+    """Return the table rows of the users, reusing cached fragments.
+
+    The users need an updated_at. Only the rows missing from the cache
+    are rendered, the others are plain string concatenation.
+    """
+    cache = get_cache()
+    today = datetime.date.today()
+    keys = [(get_row_key(user, today), user) for user in user_list]
+    cached = cache.get_many([key for key, user in keys])
+    renderer = UserRowRenderer()
+    rendered = {}
+    rows = []
+    for key, user in keys:
+        row = cached.get(key)
+        if row is None:
+            row = rendered[key] = renderer.render(user)
+        rows.append(row)
+    if rendered:
+        cache.set_many(rendered, ROW_TIMEOUT)
+    return mark_safe(''.join(rows))
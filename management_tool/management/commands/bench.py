@@ -0,0 +1,179 @@
+import datetime
+import itertools
+import json
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from management_tool.testing import bench_environment
+
+User = get_user_model()
+
+PASSWORD = 'Bench4Password'
+VIEWS = ('user_list', 'user_details', 'export_user_csv', 'signup',
+         'user_edit', 'login')
+
+
+def percentile(values, percent):
+    """Return the nearest-rank percentile of the values."""
+    values = sorted(values)
+    rank = max(int(round(percent / 100 * len(values))) - 1, 0)
+    return values[rank]
+
+
+def get_git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Generate synthetic users in a throwaway test database and '
+            'report latency, query counts, bytes out and peak memory of '
+            'the management_tool views as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000,
+                            help='Number of synthetic users to generate.')
+        parser.add_argument('--requests', type=int, default=20,
+                            help='Number of timed requests per view.')
+        parser.add_argument('--views', nargs='+', choices=VIEWS,
+                            default=VIEWS, help='Views to benchmark.')
+        parser.add_argument('--output',
+                            help='File the JSON report is written to.')
+
+    def handle(self, *args, **options):
+        with bench_environment():
+            report = self.run_bench(options)
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    # every request is timed, throttled ones would skip the work measured
+    @override_settings(THROTTLE_ENABLED=False)
+    def run_bench(self, options):
+        start = time.perf_counter()
+        self.generate_users(options['users'])
+        report = {
+            'revision': get_git_revision(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'users': options['users'],
+            'requests': options['requests'],
+            'generate_seconds': round(time.perf_counter() - start, 3),
+            'views': {},
+        }
+        self.user = User.objects.order_by('pk').first()
+        for name in options['views']:
+            report['views'][name] = self.bench_view(name,
+                                                    options['requests'])
+        return report
+
+    def generate_users(self, count, batch_size=10000):
+        """Insert users with realistic birth dates and random numbers.
+
+        They all share one password hash, hashing it per user would take
+        longer than the whole benchmark.
+        """
+        password = make_password(PASSWORD)
+        today = datetime.date.today()
+        users = (User(username='bench_user_{}'.format(i),
+                      email='bench_user_{}@example.com'.format(i),
+                      password=password,
+                      birth_date=today - datetime.timedelta(
+                          days=random.randint(5 * 365, 90 * 365)),
+                      random_number=random.randint(1, 100))
+                 for i in range(count))
+        while True:
+            batch = list(itertools.islice(users, batch_size))
+            if not batch:
+                break
+            User.objects.bulk_create(batch)
+
+    def get_client(self):
+        client = Client()
+        client.force_login(self.user)
+        return client
+
+    def get_request(self, name, iteration):
+        """Return the client, method, URL and data of a request."""
+        if name == 'user_details':
+            return (self.get_client(), 'get',
+                    reverse(name, args=[self.user.username]), None)
+        if name == 'signup':
+            return (Client(), 'post', reverse(name), {
+                'username': 'bench_signup_{}'.format(iteration),
+                'email': 'bench_signup_{}@example.com'.format(iteration),
+                'birth_date': '1990-01-01',
+                'password1': PASSWORD,
+                'password2': PASSWORD})
+        if name == 'user_edit':
+            return (self.get_client(), 'post', reverse(name), {
+                'username': self.user.username,
+                'birth_date': '1990-01-01',
+                'random_number': str(iteration % 100 + 1)})
+        if name == 'login':
+            return (Client(), 'post', reverse(name), {
+                'username': self.user.username,
+                'password': PASSWORD})
+        return self.get_client(), 'get', reverse(name), None
+
+    def send(self, client, method, url, data):
+        """Send a request and return its response and its size in bytes."""
+        response = getattr(client, method)(url, data)
+        if response.streaming:
+            size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            size = len(response.content)
+        return response, size
+
+    def bench_view(self, name, requests):
+        latencies = []
+        queries = []
+        sizes = []
+        statuses = set()
+        for iteration in range(requests):
+            # logging the client in is not part of the measured request
+            request = self.get_request(name, iteration)
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response, size = self.send(*request)
+                latencies.append(time.perf_counter() - start)
+            queries.append(len(context.captured_queries))
+            sizes.append(size)
+            statuses.add(response.status_code)
+
+        # tracemalloc slows everything down, measure memory separately
+        request = self.get_request(name, requests)
+        tracemalloc.start()
+        self.send(*request)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        return {
+            'status_codes': sorted(statuses),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+            'queries': percentile(queries, 50),
+            'bytes_out': percentile(sizes, 50),
+            'peak_memory_bytes': peak,
+        }
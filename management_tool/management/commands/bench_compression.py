@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from management_tool import compression, exports, renderers
+from management_tool.management.commands.bench_row_renderer import make_users
+
+
+def measure(chunks, encoding):
+    """Return the compressed size and the CPU seconds spent on chunks."""
+    started = time.process_time()
+    size = sum(len(data)
+               for data in compression.iter_compress(chunks, encoding))
+    return size, time.process_time() - started
+
+
+class Command(BaseCommand):
+    help = ('Compress the user list rows and the CSV export of many users '
+            'with each supported content coding and report the bytes saved '
+            'and the CPU time spent.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000,
+                            help='Number of users to render.')
+
+    def handle(self, *args, **options):
+        users, rows = make_users(options['users'])
+        html = renderers.UserRowRenderer(
+            renderers.LIST_ROW_FORMAT).render_many(rows).encode('utf-8')
+        csv_chunks = [line.encode('utf-8') for line in
+                      exports.iter_user_csv_rows(
+                          (user.username, user.birth_date, user.eligible,
+                           user.random_number, user.bizz_fuzz)
+                          for user in users)]
+        bodies = (
+            # the list page is compressed as a whole, the export is
+            # compressed line by line as it streams
+            ('user list html', [html]),
+            ('csv export', csv_chunks),
+        )
+        self.stdout.write('users: {}'.format(len(users)))
+        for name, chunks in bodies:
+            size = sum(len(chunk) for chunk in chunks)
+            self.stdout.write('{}: {} bytes'.format(name, size))
+            for encoding in compression.get_encodings():
+                compressed, seconds = measure(chunks, encoding)
+                self.stdout.write(
+                    '  {}: {} bytes, {:.1%} saved, {:.3f}s cpu, '
+                    '{:.0f} MB/s'.format(
+                        encoding, compressed, 1 - compressed / size,
+                        seconds, size / seconds / 1e6 if seconds else 0))
@@ -0,0 +1,107 @@
+import collections
+import datetime
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.template import Context, Engine
+from django.utils.safestring import mark_safe
+
+from users.models import (CustomUser, get_bizz_fuzz_category,
+                          get_eligibility_cutoff)
+from management_tool import renderers
+
+# the rows of the user_list and user_details pages before the renderer,
+# which computed eligibility and BizzFuzz with template filters. The
+# details page named its user user_details.
+ORIGINAL_ROW_TEMPLATES = {
+    renderers.LIST_ROW_FORMAT: (
+        '      <tr>\n'
+        '        <td><a href="{{ user.get_absolute_url }}">'
+        '{{ user.username }}</a></td>\n'
+        '        <td>{{ user.birth_date }}</td>\n'
+        '        <td>{{ user.birth_date|calculate_age }}</td>\n'
+        '        <td>{{ user.random_number }}</td>        \n'
+        '        <td>{{ user.random_number|get_bizz_fuzz }}</td>\n'
+        '      </tr>\n'
+    ),
+    renderers.DETAILS_ROW_FORMAT: (
+        '            <tr>\n'
+        '            <td><a href="{{ user.get_absolute_url }}">'
+        '{{ user.username }}</a></td>\n'
+        '            <td>{{ user.birth_date }}</td>\n'
+        '            <td>{{ user.birth_date|calculate_age }}</td>\n'
+        '            <td>{{ user.random_number }}</td>        \n'
+        '            <td>{{ user.random_number|get_bizz_fuzz }}</td>\n'
+        '            </tr>\n'
+    ),
+}
+
+
+def make_users(count):
+    """Return unsaved users and the matching row tuples.
+
+    The rows carry the eligibility and category the database returns,
+    from the birth date cutoff and the stored bizz_fuzz column.
+    """
+    rng = random.Random(0)
+    today = datetime.date.today()
+    cutoff = get_eligibility_cutoff(today)
+    users = []
+    for pk in range(1, count + 1):
+        random_number = rng.randint(1, 100)
+        # birth dates are optional, and recent ones are Blocked
+        birth_date = (None if rng.random() < 0.05 else
+                      today - datetime.timedelta(days=rng.randint(0, 25000)))
+        user = CustomUser(
+            pk=pk, username='user{}'.format(pk), birth_date=birth_date,
+            random_number=random_number,
+            bizz_fuzz=get_bizz_fuzz_category(random_number))
+        if birth_date is None:
+            user.eligible = ''
+        else:
+            user.eligible = 'Allowed' if birth_date <= cutoff else 'Blocked'
+        users.append(user)
+    # the same shape as values_list(*ROW_FIELDS, named=True) rows
+    Row = collections.namedtuple('Row', renderers.ROW_FIELDS)
+    rows = [Row(*(getattr(user, field) for field in renderers.ROW_FIELDS))
+            for user in users]
+    return users, rows
+
+
+class Command(BaseCommand):
+    help = ('Render user table rows with the original filter based row '
+            'markup and with the compiled row renderer, check that both '
+            'outputs are identical and report the timings.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000,
+                            help='Number of rows to render.')
+        parser.add_argument('--details', action='store_true',
+                            help='Render the user details row instead.')
+
+    def handle(self, *args, **options):
+        row_format = (renderers.DETAILS_ROW_FORMAT if options['details']
+                      else renderers.LIST_ROW_FORMAT)
+        users, rows = make_users(options['rows'])
+        template = Engine.get_default().from_string(
+            '{% load eligible bizz_fuzz %}{% for user in user_list %}'
+            + ORIGINAL_ROW_TEMPLATES[row_format] + '{% endfor %}')
+
+        started = time.perf_counter()
+        expected = template.render(Context({'user_list': users}))
+        template_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        output = mark_safe(
+            renderers.UserRowRenderer(row_format).render_many(rows))
+        renderer_time = time.perf_counter() - started
+
+        if output != expected:
+            raise CommandError('Rendered rows differ from the original '
+                               'template.')
+        self.stdout.write('rows: {}'.format(len(rows)))
+        self.stdout.write('template: {:.3f}s'.format(template_time))
+        self.stdout.write('renderer: {:.3f}s'.format(renderer_time))
+        self.stdout.write('speedup: {:.1f}x'.format(
+            template_time / renderer_time))
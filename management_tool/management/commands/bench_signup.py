@@ -0,0 +1,59 @@
+import json
+import time
+from unittest import mock
+
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from management_tool.testing import bench_environment
+
+from .bench import PASSWORD
+
+
+class Command(BaseCommand):
+    help = ('Sign up users through the signup view in a throwaway test '
+            'database and report signups per second of a single core and '
+            'password hashes per signup as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--signups', type=int, default=20,
+                            help='Number of timed signups.')
+        parser.add_argument('--iterations', type=int,
+                            help='PBKDF2 iterations, PASSWORD_PBKDF2_'
+                                 'ITERATIONS by default.')
+
+    def handle(self, *args, **options):
+        overrides = {}
+        if options['iterations']:
+            overrides['PASSWORD_PBKDF2_ITERATIONS'] = options['iterations']
+        with bench_environment(**overrides):
+            report = self.run_bench(options['signups'])
+        self.stdout.write(json.dumps(report, indent=2))
+
+    # throttled signups would skip the hashing measured here
+    @override_settings(THROTTLE_ENABLED=False)
+    def run_bench(self, signups):
+        hasher = get_hasher()
+        statuses = set()
+        with mock.patch.object(type(hasher), 'encode', autospec=True,
+                               side_effect=type(hasher).encode) as encode:
+            start = time.perf_counter()
+            for i in range(signups):
+                response = Client().post(reverse('signup'), {
+                    'username': 'bench_signup_{}'.format(i),
+                    'email': 'bench_signup_{}@example.com'.format(i),
+                    'birth_date': '1990-01-01',
+                    'password1': PASSWORD,
+                    'password2': PASSWORD})
+                statuses.add(response.status_code)
+            elapsed = time.perf_counter() - start
+        return {
+            'hasher': hasher.algorithm,
+            'iterations': getattr(hasher, 'iterations', None),
+            'signups': signups,
+            'status_codes': sorted(statuses),
+            'signups_per_second': round(signups / elapsed, 2),
+            'hashes_per_signup': encode.call_count / signups,
+        }
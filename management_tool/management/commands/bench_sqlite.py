@@ -0,0 +1,118 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from management_tool import database
+
+# plain SQLite, as sqlite3.connect() sets it up with its 5 second timeout
+DEFAULT_TIMEOUT = 5
+SCHEMA = ('CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT, '
+          'random_number INTEGER)')
+READ_SQL = ('SELECT id, username, random_number FROM users '
+            'WHERE id > ? ORDER BY id LIMIT 50')
+
+
+class Command(BaseCommand):
+    help = ('Compare the read throughput of SQLite with its default '
+            'settings and with SQLITE_PRAGMAS while a writer is busy. '
+            'Run it with the production settings.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=3,
+                            help='Duration of each run.')
+        parser.add_argument('--readers', type=int, default=4,
+                            help='Number of reader threads.')
+        parser.add_argument('--rows', type=int, default=10000,
+                            help='Number of rows seeded before a run.')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows written per write transaction.')
+
+    def handle(self, *args, **options):
+        if not settings.SQLITE_PRAGMAS:
+            raise CommandError(
+                'SQLITE_PRAGMAS is empty, run the benchmark with '
+                'DJANGO_SETTINGS_MODULE=user_management_app.'
+                'production_settings.')
+        results = {}
+        for name, pragmas in (('default', {}),
+                              ('production', settings.SQLITE_PRAGMAS)):
+            with tempfile.TemporaryDirectory() as directory:
+                results[name] = self.run(os.path.join(directory, 'bench.db'),
+                                         pragmas, options)
+            self.stdout.write(
+                '{}: {reads:.0f} reads/s, {writes:.0f} writes/s, '
+                '{errors} locked errors'.format(name, **results[name]))
+        if results['default']['reads']:
+            self.stdout.write('read speedup: {:.1f}x'.format(
+                results['production']['reads'] / results['default']['reads']))
+
+    def run(self, path, pragmas, options):
+        """Return the read and write rates seen on a fresh database."""
+        setup = database.connect(path, pragmas, DEFAULT_TIMEOUT)
+        setup.execute(SCHEMA)
+        setup.execute('BEGIN')
+        setup.executemany(
+            'INSERT INTO users (username, random_number) VALUES (?, ?)',
+            (('user{}'.format(i), i % 100) for i in range(options['rows'])))
+        setup.execute('COMMIT')
+        setup.close()
+
+        stop = threading.Event()
+        counts = {'reads': 0, 'writes': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def count(key):
+            with lock:
+                counts[key] += 1
+
+        def read():
+            connection = database.connect(path, pragmas, DEFAULT_TIMEOUT)
+            after = 0
+            while not stop.is_set():
+                try:
+                    rows = connection.execute(READ_SQL, [after]).fetchall()
+                except sqlite3.OperationalError:
+                    count('errors')
+                    continue
+                after = rows[-1][0] if rows else 0
+                count('reads')
+            connection.close()
+
+        def write():
+            connection = database.connect(path, pragmas, DEFAULT_TIMEOUT)
+            while not stop.is_set():
+                try:
+                    connection.execute('BEGIN IMMEDIATE')
+                    connection.executemany(
+                        'INSERT INTO users (username, random_number) '
+                        'VALUES (?, ?)',
+                        (('new', i) for i in range(options['batch_size'])))
+                    connection.execute(
+                        'UPDATE users SET random_number = random_number + 1 '
+                        'WHERE id % 97 = 0')
+                    connection.execute('COMMIT')
+                except sqlite3.OperationalError:
+                    if connection.in_transaction:
+                        connection.execute('ROLLBACK')
+                    count('errors')
+                    continue
+                count('writes')
+            connection.close()
+
+        threads = [threading.Thread(target=write)]
+        threads += [threading.Thread(target=read)
+                    for _ in range(options['readers'])]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return {'reads': counts['reads'] / options['seconds'],
+                'writes': counts['writes'] / options['seconds'],
+                'errors': counts['errors']}
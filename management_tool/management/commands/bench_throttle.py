@@ -0,0 +1,113 @@
+import json
+import logging
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from management_tool import throttling
+from management_tool.testing import bench_environment
+
+from .bench import PASSWORD, percentile
+
+User = get_user_model()
+
+# the flood comes from a single host, the pages are read from another
+FLOOD_ADDRESS = '10.0.0.1'
+
+
+class Command(BaseCommand):
+    help = ('Measure the latency of the user list and user details pages '
+            'while other threads flood the login view with wrong '
+            'passwords, with and without throttling, in a throwaway test '
+            'database, and report the results as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=10,
+                            help='Duration of each phase.')
+        parser.add_argument('--flood-threads', type=int, default=4,
+                            help='Number of threads posting logins.')
+        parser.add_argument('--flood-rate', type=float, default=40,
+                            help='Login attempts per second sent by all '
+                                 'threads together.')
+
+    def handle(self, *args, **options):
+        # every throttled login would log a warning
+        logger = logging.getLogger('django.request')
+        level = logger.level
+        logger.setLevel(logging.ERROR)
+        try:
+            with bench_environment():
+                report = self.run_bench(options['seconds'],
+                                        options['flood_threads'],
+                                        options['flood_rate'])
+        finally:
+            logger.setLevel(level)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run_bench(self, seconds, flood_threads, flood_rate):
+        User.objects.create_user('bench_reader', 'reader@example.com',
+                                 PASSWORD)
+        report = {'baseline': self.run_phase(seconds, 0, flood_rate)}
+        with override_settings(THROTTLE_ENABLED=False):
+            report['flood'] = self.run_phase(seconds, flood_threads,
+                                             flood_rate)
+        report['flood_throttled'] = self.run_phase(seconds, flood_threads,
+                                                   flood_rate)
+        return report
+
+    def run_phase(self, seconds, flood_threads, flood_rate):
+        """Time page reads while flood_threads threads post logins."""
+        throttling.get_cache().clear()
+        stop = threading.Event()
+        statuses = []
+        interval = flood_threads / flood_rate
+        threads = [threading.Thread(target=self.flood,
+                                    args=(stop, statuses, i, interval))
+                   for i in range(flood_threads)]
+        for thread in threads:
+            thread.start()
+        client = Client()
+        client.login(username='bench_reader', password=PASSWORD)
+        paths = [reverse('user_list'),
+                 reverse('user_details', args=['bench_reader'])]
+        latencies = []
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            client.get(paths[len(latencies) % len(paths)])
+            latencies.append(time.perf_counter() - start)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return {
+            'page_requests': len(latencies),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'login_attempts': len(statuses),
+            'login_throttled': statuses.count(429),
+        }
+
+    def flood(self, stop, statuses, number, interval):
+        """Post wrong passwords for many usernames, one every interval.
+
+        The rate is set by the attacker, not by the server, so when an
+        attempt takes longer than the interval the next one follows at once.
+        """
+        client = Client(REMOTE_ADDR=FLOOD_ADDRESS)
+        attempt = 0
+        next_attempt = time.perf_counter()
+        try:
+            while not stop.wait(max(0, next_attempt - time.perf_counter())):
+                next_attempt += interval
+                attempt += 1
+                response = client.post(reverse('login'), {
+                    'username': 'victim_{}_{}'.format(number, attempt),
+                    'password': 'wrong-password'})
+                statuses.append(response.status_code)
+        finally:
+            connections.close_all()
@@ -0,0 +1,91 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+SETTINGS_MODULE = 'user_management_app.production_settings'
+PATHS = ('/login/', '/signup/', '/home/')
+
+# Run in a fresh interpreter, so nothing is compiled or connected yet. The
+# first path is requested again at the end to show the steady state.
+WORKER_SCRIPT = '''
+import json, sys, time
+from wsgiref.util import setup_testing_defaults
+
+start = time.perf_counter()
+from user_management_app.wsgi import application
+report = {'load': time.perf_counter() - start}
+paths = sys.argv[1:]
+for key, path in enumerate(paths + paths[:1]):
+    environ = {'PATH_INFO': path}
+    setup_testing_defaults(environ)
+    statuses = []
+    start = time.perf_counter()
+    b''.join(application(environ, lambda status, headers, exc_info=None:
+                         statuses.append(status)))
+    report[key] = (time.perf_counter() - start, statuses[0])
+print(json.dumps(report))
+'''
+
+
+class Command(BaseCommand):
+    help = ('Start fresh worker processes with the production settings, '
+            'with and without the wsgi.py warm-up, and report the load '
+            'time and the latency of their first requests as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5,
+                            help='Worker processes started per mode.')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            static_root = os.path.join(directory, 'static')
+            # the workers only read pages that need no tables, but the
+            # production pragmas would still switch a database to WAL, so
+            # they get their own file instead of the configured one
+            env = dict(os.environ,
+                       DATABASE_NAME=os.path.join(directory, 'db.sqlite3'),
+                       DJANGO_SETTINGS_MODULE=SETTINGS_MODULE,
+                       DJANGO_SECRET_KEY=os.environ.get(
+                           'DJANGO_SECRET_KEY', settings.SECRET_KEY),
+                       DJANGO_ALLOWED_HOSTS='127.0.0.1',
+                       DJANGO_STATIC_ROOT=static_root,
+                       METRICS_DB='')
+            subprocess.run([sys.executable, 'manage.py', 'collectstatic',
+                            '--noinput', '--verbosity', '0'],
+                           cwd=settings.BASE_DIR, env=env, check=True)
+            report = {
+                mode: self.run_workers(options['runs'],
+                                       dict(env, WSGI_WARM_UP=warm_up))
+                for mode, warm_up in (('cold', '0'), ('warm', '1'))}
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run_workers(self, runs, env):
+        """Return the median timings in milliseconds of runs workers."""
+        results = []
+        for i in range(runs):
+            output = subprocess.run(
+                [sys.executable, '-c', WORKER_SCRIPT] + list(PATHS),
+                cwd=settings.BASE_DIR, env=env, check=True,
+                stdout=subprocess.PIPE).stdout
+            results.append(json.loads(output.decode().splitlines()[-1]))
+        labels = ['first ' + path for path in PATHS]
+        labels.append('again ' + PATHS[0])
+        report = {'load_ms': self.median_ms(
+            result['load'] for result in results)}
+        for key, label in enumerate(labels):
+            report[label + ' ms'] = self.median_ms(
+                result[str(key)][0] for result in results)
+        report['statuses'] = sorted({result[str(key)][1]
+                                     for result in results
+                                     for key in range(len(labels))})
+        return report
+
+    @staticmethod
+    def median_ms(seconds):
+        return round(statistics.median(seconds) * 1000, 2)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from management_tool import exports
+from management_tool.models import ExportJob
+
+
+class Command(BaseCommand):
+    help = ('Run pending background exports, for instance those left over '
+            'after a restart, retry running ones whose process died and '
+            'delete expired export files.')
+
+    def handle(self, *args, **options):
+        reset = exports.reset_stale_export_jobs()
+        pending = list(ExportJob.objects.filter(
+            status=ExportJob.PENDING).order_by('created_at').values_list(
+                'pk', flat=True))
+        for job_pk in pending:
+            exports.run_export_job(job_pk)
+        deleted = exports.delete_expired_export_jobs()
+        self.stdout.write(self.style.SUCCESS(
+            'Ran {} export jobs, {} of them stale, deleted {} expired '
+            'ones.'.format(len(pending), reset, deleted)))
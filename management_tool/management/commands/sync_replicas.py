@@ -0,0 +1,42 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = ('Copy the primary SQLite database into every replica of '
+            'DATABASE_REPLICAS, for local testing of the replica router.')
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Only SQLite replicas can be synced, other '
+                               'databases have their own replication.')
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('DATABASE_REPLICAS is empty.')
+        for alias in settings.DATABASE_REPLICAS:
+            replica = connections[alias]
+            if replica.vendor != 'sqlite':
+                raise CommandError(
+                    'Replica {} is not a SQLite database.'.format(alias))
+            if (replica.settings_dict['NAME']
+                    == primary.settings_dict['NAME']):
+                raise CommandError(
+                    'Replica {} is the primary database.'.format(alias))
+            replica.close()
+            self.copy(primary.settings_dict['NAME'],
+                      replica.settings_dict['NAME'])
+            self.stdout.write(self.style.SUCCESS(
+                'Synced replica {}.'.format(alias)))
+
+    def copy(self, source_name, target_name):
+        """Copy a live SQLite database page by page with the backup API."""
+        source = sqlite3.connect(source_name)
+        target = sqlite3.connect(target_name)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
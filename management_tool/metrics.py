@@ -0,0 +1,178 @@
+import collections
+import logging
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# upper bounds of the request latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+
+
+class QueryCounter:
+    """Count the queries run through a connection and their total time.
+
+    Installed with ``connection.execute_wrapper()``.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+class MetricsRegistry:
+    """Per-view request metrics of this process.
+
+    Requests only add to an in-memory dict under a short lock. Every
+    METRICS_FLUSH_INTERVAL seconds the additions are merged into the
+    METRICS_DB SQLite file, where all worker processes add up. When the
+    file cannot be written the additions are kept for the next flush, a
+    request never fails because of its metrics.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = self.new_values()
+        self.flushed = self.new_values()
+        self.last_flush = time.monotonic()
+
+    @staticmethod
+    def new_values():
+        return collections.defaultdict(lambda: collections.defaultdict(float))
+
+    def record(self, view, seconds, queries, sql_seconds, size):
+        """Add one request to the metrics of a view."""
+        bucket = next((str(bound) for bound in LATENCY_BUCKETS
+                       if seconds <= bound), '+Inf')
+        with self.lock:
+            values = self.pending[view]
+            values['requests'] += 1
+            values['seconds'] += seconds
+            values['bucket:' + bucket] += 1
+            values['queries'] += queries
+            values['sql_seconds'] += sql_seconds
+            values['bytes'] += size
+        if (time.monotonic() - self.last_flush
+                >= settings.METRICS_FLUSH_INTERVAL):
+            self.flush()
+
+    def connect(self):
+        db = sqlite3.connect(settings.METRICS_DB, timeout=5)
+        db.execute('CREATE TABLE IF NOT EXISTS metrics ('
+                   'view TEXT, name TEXT, value REAL, '
+                   'PRIMARY KEY (view, name))')
+        return db
+
+    def flush(self):
+        """Merge the pending metrics into the shared file."""
+        with self.lock:
+            pending, self.pending = self.pending, self.new_values()
+            self.last_flush = time.monotonic()
+        rows = [(view, name, value)
+                for view, values in pending.items()
+                for name, value in values.items()]
+        if not settings.METRICS_DB:
+            # no shared file, keep the totals of this process only
+            with self.lock:
+                for view, name, value in rows:
+                    self.flushed[view][name] += value
+            return
+        try:
+            db = self.connect()
+            try:
+                with db:
+                    db.executemany(
+                        'INSERT INTO metrics (view, name, value) '
+                        'VALUES (?, ?, ?) '
+                        'ON CONFLICT (view, name) '
+                        'DO UPDATE SET value = value + excluded.value', rows)
+            finally:
+                db.close()
+        except sqlite3.Error:
+            logger.exception('Could not write metrics to %s',
+                             settings.METRICS_DB)
+            with self.lock:
+                for view, name, value in rows:
+                    self.pending[view][name] += value
+
+    def collect(self):
+        """Return the metrics of every process, keyed by view."""
+        self.flush()
+        if not settings.METRICS_DB:
+            with self.lock:
+                return {view: dict(values)
+                        for view, values in self.flushed.items()}
+        totals = collections.defaultdict(dict)
+        try:
+            db = self.connect()
+            try:
+                for view, name, value in db.execute(
+                        'SELECT view, name, value FROM metrics'):
+                    totals[view][name] = value
+            finally:
+                db.close()
+        except sqlite3.Error:
+            logger.exception('Could not read metrics from %s',
+                             settings.METRICS_DB)
+            # only what this process has not written yet is known
+            with self.lock:
+                return {view: dict(values)
+                        for view, values in self.pending.items()}
+        return totals
+
+
+registry = MetricsRegistry()
+
+
+def format_value(value):
+    return repr(int(value)) if value == int(value) else repr(value)
+
+
+def render_prometheus(totals):
+    """Render collected metrics in the Prometheus text format."""
+    lines = []
+
+    def counter(name, help_text, key):
+        lines.append('# HELP {} {}'.format(name, help_text))
+        lines.append('# TYPE {} counter'.format(name))
+        for view in sorted(totals):
+            lines.append('{}{{view="{}"}} {}'.format(
+                name, view, format_value(totals[view].get(key, 0))))
+
+    counter('django_http_requests_total',
+            'Requests handled per view.', 'requests')
+
+    name = 'django_http_request_duration_seconds'
+    lines.append('# HELP {} Request latency per view.'.format(name))
+    lines.append('# TYPE {} histogram'.format(name))
+    for view in sorted(totals):
+        values = totals[view]
+        cumulative = 0
+        for bound in LATENCY_BUCKETS + ('+Inf',):
+            cumulative += values.get('bucket:{}'.format(bound), 0)
+            lines.append('{}_bucket{{view="{}",le="{}"}} {}'.format(
+                name, view, bound, format_value(cumulative)))
+        lines.append('{}_sum{{view="{}"}} {}'.format(
+            name, view, format_value(values.get('seconds', 0))))
+        lines.append('{}_count{{view="{}"}} {}'.format(
+            name, view, format_value(values.get('requests', 0))))
+
+    counter('django_sql_queries_total',
+            'SQL queries run per view.', 'queries')
+    counter('django_sql_duration_seconds_total',
+            'Time spent in SQL queries per view.', 'sql_seconds')
+    counter('django_http_response_bytes_total',
+            'Response body bytes sent per view.', 'bytes')
+    return '\n'.join(lines) + '\n'
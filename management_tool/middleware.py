@@ -0,0 +1,111 @@
+import contextlib
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+
+from . import compression
+from .metrics import QueryCounter, registry
+
+
+class MetricsMiddleware:
+    """Record latency, SQL queries and response size per URL name.
+
+    Streaming responses are measured once their content is consumed,
+    since that is when their queries run and their bytes are sent. File
+    responses are left for the server's wsgi.file_wrapper, their size is
+    known from Content-Length.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with self.count_queries(counter):
+            response = self.get_response(request)
+        view = (request.resolver_match.url_name
+                if request.resolver_match else None) or '<unresolved>'
+        if getattr(response, 'file_to_stream', None) is not None:
+            registry.record(view, time.perf_counter() - start,
+                            counter.count, counter.seconds,
+                            int(response.get('Content-Length', 0)))
+        elif response.streaming:
+            response.streaming_content = self.measure_stream(
+                response.streaming_content, view, start, counter)
+        else:
+            registry.record(view, time.perf_counter() - start,
+                            counter.count, counter.seconds,
+                            len(response.content))
+        return response
+
+    def count_queries(self, counter):
+        """Count the queries of every database alias, replicas included."""
+        stack = contextlib.ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(counter))
+        return stack
+
+    def measure_stream(self, content, view, start, counter):
+        size = 0
+        try:
+            with self.count_queries(counter):
+                for chunk in content:
+                    size += len(chunk)
+                    yield chunk
+        finally:
+            registry.record(view, time.perf_counter() - start,
+                            counter.count, counter.seconds, size)
+
+
+class CompressionMiddleware:
+    """Compress text responses with brotli or gzip.
+
+    The coding is negotiated from Accept-Encoding. Streaming responses are
+    compressed chunk by chunk as they are sent, responses shorter than
+    COMPRESSION_MIN_SIZE are left alone. So are file responses, which
+    would otherwise be read through Python instead of wsgi.file_wrapper.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.is_compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = compression.choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+        if response.streaming:
+            response.streaming_content = compression.iter_compress(
+                response.streaming_content, encoding)
+            del response['Content-Length']
+        else:
+            content = compression.compress(response.content, encoding)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+        # a strong ETag names the exact bytes, which are now different
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+    @staticmethod
+    def is_compressible(response):
+        if response.has_header('Content-Encoding'):
+            return False
+        if getattr(response, 'file_to_stream', None) is not None:
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0]
+        if content_type not in settings.COMPRESSION_CONTENT_TYPES:
+            return False
+        return (response.streaming or
+                len(response.content) >= settings.COMPRESSION_MIN_SIZE)
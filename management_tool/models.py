@@ -1,3 +1,42 @@
+import os
+
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class ExportJob(models.Model):
+    """A user list export written to disk in the background."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             on_delete=models.CASCADE,
+                             related_name='export_jobs')
+    eligible = models.CharField(max_length=7, blank=True)
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES,
+                              default=PENDING, db_index=True)
+    file_name = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('-created_at',)
+
+    def __str__(self):
+        return 'Export {} ({})'.format(self.pk, self.status)
+
+    @property
+    def path(self):
+        """Absolute path of the finished CSV file."""
+        return os.path.join(settings.EXPORT_ROOT, self.file_name)
@@ -0,0 +1,91 @@
+from urllib.parse import quote
+
+from django.urls import reverse
+from django.utils.formats import localize
+
+# columns a rendered row needs, the rows are values_list(named=True) tuples
+ROW_FIELDS = ('pk', 'username', 'birth_date', 'eligible', 'random_number',
+              'bizz_fuzz')
+
+# the same markup as management_tool/user_list_row.html
+LIST_ROW_FORMAT = (
+    '      <tr>\n'
+    '        <td><a href="{url}">{username}</a></td>\n'
+    '        <td>{birth_date}</td>\n'
+    '        <td>{eligible}</td>\n'
+    '        <td>{random_number}</td>        \n'
+    '        <td>{bizz_fuzz}</td>\n'
+    '      </tr>\n'
+)
+
+# the same markup as management_tool/user_details_row.html
+DETAILS_ROW_FORMAT = (
+    '            <tr>\n'
+    '            <td><a href="{url}">{username}</a></td>\n'
+    '            <td>{birth_date}</td>\n'
+    '            <td>{eligible}</td>\n'
+    '            <td>{random_number}</td>        \n'
+    '            <td>{bizz_fuzz}</td>\n'
+    '            </tr>\n'
+)
+
+# characters reverse() leaves unquoted in a URL argument
+URL_SAFE_CHARACTERS = "!$&'()*+,;=" + '/~:@'
+USERNAME_PLACEHOLDER = 'username'
+
+# the table of django.utils.html.escape, without its lazy string and
+# SafeString handling that shows up when called for every cell
+HTML_ESCAPES = str.maketrans({
+    '&': '&amp;',
+    '<': '&lt;',
+    '>': '&gt;',
+    '"': '&quot;',
+    "'": '&#39;',
+})
+
+
+def escape(text):
+    return str(text).translate(HTML_ESCAPES)
+
+
+class UserRowRenderer:
+    """Render user table rows without going through the template engine.
+
+    The output is byte-identical to the row templates. The user details
+    URL is reversed once, and the printed dates, numbers and categories
+    are reused across rows since few distinct values occur.
+    """
+
+    def __init__(self, row_format=LIST_ROW_FORMAT):
+        self.row_format = row_format
+        self.url_prefix, self.url_suffix = reverse(
+            'user_details', args=[USERNAME_PLACEHOLDER]).rsplit(
+                USERNAME_PLACEHOLDER, 1)
+        self.localized = {}
+
+    def localize(self, value):
+        """Return a value as the template engine would print it."""
+        key = (type(value), value)
+        try:
+            return self.localized[key]
+        except KeyError:
+            text = self.localized[key] = escape(localize(value))
+            return text
+
+    def render(self, user):
+        """Return the table row of a single user."""
+        random_number = self.localize(user.random_number)
+        return self.row_format.format(
+            url=escape(self.url_prefix
+                       + quote(user.username, safe=URL_SAFE_CHARACTERS)
+                       + self.url_suffix),
+            username=escape(user.username),
+            birth_date=self.localize(user.birth_date),
+            eligible=self.localize(user.eligible),
+            random_number=random_number,
+            bizz_fuzz=self.localize(user.bizz_fuzz) if user.bizz_fuzz
+            else random_number)
+
+    def render_many(self, user_list):
+        """Return the table rows of the users, joined."""
+        return ''.join(self.render(user) for user in user_list)
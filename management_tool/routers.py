@@ -0,0 +1,114 @@
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# name of the cookie pinning a client to the primary after a write
+PIN_COOKIE_NAME = 'pin_primary'
+
+state = threading.local()
+
+
+def is_pinned():
+    """Return whether reads of this thread must go to the primary."""
+    return getattr(state, 'pinned', False)
+
+
+def pin_to_primary():
+    """Send the reads of this thread to the primary from now on."""
+    state.pinned = True
+
+
+def unpin():
+    state.pinned = False
+    state.wrote = False
+
+
+def has_written():
+    """Return whether this thread wrote since it was last unpinned."""
+    return getattr(state, 'wrote', False)
+
+
+def get_replicas():
+    """Return the aliases of DATABASE_REPLICAS holding another database.
+
+    Test runs turn replicas into mirrors of the primary, whose reads are
+    better sent to the primary itself, inside the test transaction.
+    """
+    primary = connections.databases[DEFAULT_DB_ALIAS]['NAME']
+    return [alias for alias in settings.DATABASE_REPLICAS
+            if connections.databases.get(alias, {}).get('NAME') != primary]
+
+
+def iter_pinned(content, pinned):
+    """Stream content with the pin of the request that returned it.
+
+    A streamed body is produced after the middleware returned, so the pin
+    is restored while it runs and only released once it is closed.
+    """
+    if pinned:
+        pin_to_primary()
+    try:
+        yield from content
+    finally:
+        unpin()
+
+
+class PrimaryReplicaRouter:
+    """Send writes to the primary and reads to the DATABASE_REPLICAS.
+
+    After a write, the thread reads from the primary as well, so a request
+    sees its own changes. ReplicaPinMiddleware extends that to the
+    following requests of the same client for REPLICA_PIN_SECONDS.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if is_pinned() or not replicas:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state.wrote = True
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas are copies of the primary, see sync_replicas
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaPinMiddleware:
+    """Pin a client to the primary for a while after it wrote something.
+
+    A cookie carries the pin across requests, which may be served by
+    different worker processes. The pin of a streaming response lasts
+    until its body is closed, file responses run no queries and are left
+    for the server's wsgi.file_wrapper.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        unpin()
+        if request.COOKIES.get(PIN_COOKIE_NAME):
+            pin_to_primary()
+        try:
+            response = self.get_response(request)
+            if has_written():
+                response.set_cookie(PIN_COOKIE_NAME, '1',
+                                    max_age=settings.REPLICA_PIN_SECONDS,
+                                    httponly=True, samesite='Lax')
+            if (response.streaming and
+                    getattr(response, 'file_to_stream', None) is None):
+                response.streaming_content = iter_pinned(
+                    response.streaming_content, is_pinned())
+        finally:
+            unpin()
+        return response
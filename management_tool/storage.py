@@ -0,0 +1,58 @@
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+from . import compression
+
+# file types that are already compressed
+INCOMPRESSIBLE_EXTENSIONS = {
+    '.br', '.gif', '.gz', '.ico', '.jpeg', '.jpg', '.png', '.webp', '.woff',
+    '.woff2', '.zip',
+}
+# a compressed variant is only kept when it saves at least this fraction
+MIN_COMPRESSION_SAVING = 0.05
+
+
+def compress_file(path):
+    """Write the .gz and, if Brotli is installed, .br variants of a file.
+
+    Return the suffixes of the variants written, a variant hardly smaller
+    than the file is not worth a second lookup by the handler.
+    """
+    with open(path, 'rb') as original:
+        content = original.read()
+    written = []
+    for encoding in compression.get_encodings():
+        compressed = compression.compress(content, encoding,
+                                          compression.MAX_LEVELS[encoding])
+        if len(compressed) > len(content) * (1 - MIN_COMPRESSION_SAVING):
+            continue
+        suffix = compression.SUFFIXES[encoding]
+        with open(path + suffix, 'wb') as variant:
+            variant.write(compressed)
+        written.append(suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that precompresses the collected files.
+
+    Compression runs once at collectstatic time, so the static file
+    handler only has to pick the variant a client accepts.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        files = set()
+        for name, hashed_name, processed in super().post_process(
+                paths, dry_run, **options):
+            if not isinstance(processed, Exception):
+                files.add(name)
+                if hashed_name:
+                    files.add(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in INCOMPRESSIBLE_EXTENSIONS:
+                continue
+            compress_file(self.path(name))
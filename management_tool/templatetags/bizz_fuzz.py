@@ -1,5 +1,7 @@
 from django import template
 
+from users.models import get_bizz_fuzz_category
+
 register = template.Library()
 
 
@@ -7,13 +9,6 @@ register = template.Library()
 def get_bizz_fuzz(random_number):
     """Get BizzFuzz representation of a user random number."""
     try:
-        if random_number % 3 == 0 and random_number % 5 == 0:
-            return 'BizzFuzz'
-        elif random_number % 3 == 0:
-            return 'Bizz'
-        elif random_number % 5 == 0:
-            return 'Fuzz'
-        else:
-            return random_number
+        return get_bizz_fuzz_category(random_number) or random_number
     except TypeError:
         return ''
@@ -0,0 +1,40 @@
+import contextlib
+
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import (setup_databases, setup_test_environment,
+                               teardown_databases, teardown_test_environment)
+
+
+class TestRunner(DiscoverRunner):
+    """Run the tests with request metrics kept in memory.
+
+    Tests that need the shared metrics file point METRICS_DB at a
+    temporary one.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.metrics_override = override_settings(METRICS_DB=None)
+        self.metrics_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.metrics_override.disable()
+        super().teardown_test_environment(**kwargs)
+
+
+@contextlib.contextmanager
+def bench_environment(**overrides):
+    """Run a benchmark in a throwaway test database.
+
+    Like the tests, its requests stay out of the shared metrics file. Other
+    settings can be overridden for the duration of the benchmark.
+    """
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        with override_settings(METRICS_DB=None, **overrides):
+            yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
@@ -1,13 +1,43 @@
 import datetime
 import csv
+import gzip
+import importlib
 import io
-
-from django.test import TestCase
+import json
+import os
+import shutil
+import sys
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.test import (RequestFactory, TestCase, TransactionTestCase,
+                         override_settings)
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import get_hasher
 from django.urls import reverse
 from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import CommandError
+from django.db import connections
+from django.db.models import F
+from django.template import engines
+from django.template.loader import render_to_string
+from django.utils import timezone
 
 from users.forms import CustomUserCreationForm, CustomUserChangeForm
+from management_tool import database, exports, fragments, metrics, routers
+from management_tool.management.commands import (bench, bench_signup,
+                                                 bench_throttle, sync_replicas)
+from management_tool.models import ExportJob
+from management_tool import compression, renderers, throttling, warmup
+from management_tool.middleware import (CompressionMiddleware,
+                                        MetricsMiddleware)
+from management_tool.storage import compress_file
+from user_management_app.static import StaticFilesHandler
 
 User = get_user_model()
 
@@ -67,6 +97,39 @@ class SignupViewTest(TestCase):
                                     })
         self.assertEqual(response.status_code, 200)
 
+    def test_signup_hashes_password_once_and_logs_in(self):
+        hasher = type(get_hasher())
+        with mock.patch.object(hasher, 'encode', autospec=True,
+                               side_effect=hasher.encode) as encode:
+            response = self.client.post('/signup/', {
+                'username': 'TestUser',
+                'email': 'test3@test31.com',
+                'birth_date': '1990-01-01',
+                'password1': 'Pw4Newuser',
+                'password2': 'Pw4Newuser'})
+        self.assertRedirects(response, reverse('home'))
+        self.assertEqual(encode.call_count, 1)
+        user = User.objects.get(username='TestUser')
+        self.assertEqual(int(self.client.session['_auth_user_id']), user.pk)
+        self.assertTrue(user.check_password('Pw4Newuser'))
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000,
+                       THROTTLE_RATES={'signup': {'ip': (1, 60)}})
+    def test_bench_signup(self):
+        # run against the test database, the command makes its own
+        report = bench_signup.Command().run_bench(3)
+        self.assertEqual(report['iterations'], 1000)
+        self.assertEqual(report['status_codes'], [302])
+        self.assertEqual(report['hashes_per_signup'], 1)
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000, THROTTLE_RATES={
+        'login': {'ip': (1, 60)}, 'signup': {'ip': (1, 60)}})
+    def test_bench_is_not_throttled(self):
+        report = bench.Command().run_bench(
+            {'users': 5, 'requests': 3, 'views': ['login', 'signup']})
+        for name in ('login', 'signup'):
+            self.assertEqual(report['views'][name]['status_codes'], [302])
+
 
 class HomeViewTest(TestCase):
     """Test home view."""
@@ -122,6 +185,158 @@ class UserListViewTest(TestCase):
         self.assertEqual(len(response.context['user_list']), 1)
         self.assertEqual(response.context['user_list'][0].username, 'john')
 
+    def test_get_user_list_is_paginated_by_cursor(self):
+        for i in range(4):
+            User.objects.create_user('user{}'.format(i),
+                                     'user{}@thebeatles.com'.format(i),
+                                     'foo')
+        response = self.client.get(reverse('user_list'), {'page_size': 2})
+        page = response.context['user_list']
+        self.assertEqual([u.username for u in page], ['john', 'user0'])
+        self.assertEqual(response.context['next_cursor'], page[-1].pk)
+        response = self.client.get(reverse('user_list'),
+                                   {'page_size': 2,
+                                    'after': response.context['next_cursor']})
+        self.assertEqual([u.username for u in response.context['user_list']],
+                         ['user1', 'user2'])
+
+    def test_get_user_list_last_page_has_no_cursor(self):
+        response = self.client.get(reverse('user_list'), {'page_size': 5})
+        self.assertIsNone(response.context['next_cursor'])
+        self.assertNotContains(response, 'id="load-more"')
+
+    def test_get_user_list_ignores_invalid_cursor(self):
+        response = self.client.get(reverse('user_list'), {'after': 'abc'})
+        self.assertEqual(len(response.context['user_list']), 1)
+
+    def test_get_user_list_filtered_by_eligibility(self):
+        User.objects.create_user('paul', 'paul@thebeatles.com', 'foo',
+                                 birth_date=datetime.date(1942, 6, 18))
+        User.objects.create_user('kid', 'kid@thebeatles.com', 'foo',
+                                 birth_date=datetime.date.today())
+        response = self.client.get(reverse('user_list'),
+                                   {'eligible': 'Allowed'})
+        self.assertEqual([u.username for u in response.context['user_list']],
+                         ['paul'])
+        self.assertEqual(response.context['user_list'][0].eligible, 'Allowed')
+        response = self.client.get(reverse('user_list'),
+                                   {'eligible': 'Blocked'})
+        self.assertEqual([u.username for u in response.context['user_list']],
+                         ['kid'])
+        self.assertContains(response, '/download/?eligible=Blocked')
+
+    def test_get_user_list_rows_renders_only_rows(self):
+        User.objects.create_user('paul', 'paul@thebeatles.com', 'foo')
+        response = self.client.get(reverse('user_list_rows'),
+                                   {'after': self.user.pk, 'page_size': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response,
+                                'management_tool/user_list_rows.html')
+        self.assertTemplateNotUsed(response, 'management_tool/base.html')
+        self.assertContains(response, '<tr>', count=1)
+        self.assertContains(response, 'paul')
+        self.assertEqual(response['X-Next-Cursor'], '')
+
+
+class UserRowCacheTest(TestCase):
+    """Test the cached user list row fragments."""
+
+    def setUp(self):
+        caches['user_rows'].clear()
+        self.addCleanup(caches['user_rows'].clear)
+        self.user = User.objects.create_user('john', 'lennon@thebeatles.com',
+                                             'johnpassword', random_number=7)
+        self.client.login(username='john', password='johnpassword')
+
+    def test_rows_are_served_from_cache(self):
+        self.client.get(reverse('user_list'))
+        # a raw update leaves updated_at alone, so the cached row is used
+        User._base_manager.filter(pk=self.user.pk).update(random_number=8)
+        response = self.client.get(reverse('user_list'))
+        self.assertContains(response, '<td>7</td>')
+        self.assertNotContains(response, '<td>8</td>')
+
+    def test_saved_user_row_is_refreshed(self):
+        self.client.get(reverse('user_list'))
+        self.user.random_number = 8
+        self.user.save()
+        response = self.client.get(reverse('user_list'))
+        self.assertContains(response, '<td>8</td>')
+
+    def test_bulk_updated_user_rows_are_refreshed(self):
+        self.client.get(reverse('user_list'))
+        User.objects.filter(pk=self.user.pk).update(random_number=8)
+        response = self.client.get(reverse('user_list_rows'))
+        self.assertContains(response, '<td>8</td>')
+
+    def test_change_from_other_process_is_seen(self):
+        self.client.get(reverse('user_list'))
+        # another worker saved the user, nothing was invalidated here
+        with mock.patch('django.db.models.signals.post_save.send'):
+            self.user.random_number = 8
+            self.user.save()
+        response = self.client.get(reverse('user_list'))
+        self.assertContains(response, '<td>8</td>')
+
+    def test_rows_expire_with_the_date(self):
+        today = datetime.date(2020, 3, 16)
+        self.assertNotEqual(
+            fragments.get_row_key(self.user, today),
+            fragments.get_row_key(self.user,
+                                  today + datetime.timedelta(days=1)))
+
+
+class UserRowRendererTest(TestCase):
+    """Test the compiled user row renderer against the row templates."""
+
+    def setUp(self):
+        User.objects.create_user('john', 'lennon@thebeatles.com',
+                                 'johnpassword', random_number=7,
+                                 birth_date=datetime.date(1940, 10, 9))
+        User.objects.create_user('Zoë<&>"\'', 'zoe@example.com',
+                                 random_number=15)
+        User.objects.create_user('a b+c@d.e', 'abc@example.com',
+                                 random_number=3,
+                                 birth_date=datetime.date(2020, 2, 29))
+        User.objects.create_user('%2F~x', 'x@example.com', random_number=-4)
+
+    def assertRendersLike(self, row_format, template_name):
+        today = datetime.date(2020, 3, 16)
+        users = User.objects.with_eligibility(today).order_by('pk')
+        rows = users.values_list(*renderers.ROW_FIELDS, named=True)
+        renderer = renderers.UserRowRenderer(row_format)
+        for user, row in zip(users, rows):
+            self.assertEqual(renderer.render(row),
+                             render_to_string(template_name, {'user': user}))
+
+    def test_list_row_matches_template(self):
+        self.assertRendersLike(renderers.LIST_ROW_FORMAT,
+                               'management_tool/user_list_row.html')
+
+    def test_details_row_matches_template(self):
+        self.assertRendersLike(renderers.DETAILS_ROW_FORMAT,
+                               'management_tool/user_details_row.html')
+
+    def test_render_many(self):
+        rows = User.objects.with_eligibility().order_by('pk').values_list(
+            *renderers.ROW_FIELDS, named=True)
+        renderer = renderers.UserRowRenderer()
+        self.assertEqual(renderer.render_many(rows),
+                         ''.join(renderer.render(row) for row in rows))
+
+    def test_bench_row_renderer_command(self):
+        out = io.StringIO()
+        call_command('bench_row_renderer', rows=50, stdout=out)
+        self.assertIn('speedup', out.getvalue())
+        call_command('bench_row_renderer', rows=50, details=True, stdout=out)
+
+    def test_bench_row_renderer_command_checks_the_output(self):
+        with mock.patch.object(renderers.UserRowRenderer, 'render_many',
+                               return_value=''):
+            with self.assertRaises(CommandError):
+                call_command('bench_row_renderer', rows=5,
+                             stdout=io.StringIO())
+
 
 class UserDetailsViewTest(TestCase):
     """Test user details view."""
@@ -173,6 +388,93 @@ class UserDetailsViewTest(TestCase):
         self.assertEqual(response.context['user_details'].username, 'john')
 
 
+class ConditionalGetTest(TestCase):
+    """Test ETag and Last-Modified handling of the read-only views."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('john', 'lennon@thebeatles.com',
+                                             'johnpassword')
+        self.client.login(username='john', password='johnpassword')
+
+    def assertNotModified(self, url):
+        # the first response sets the CSRF cookie the ETag depends on
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'])
+        response = self.client.get(url,
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        return response
+
+    def test_user_list_not_modified(self):
+        self.assertNotModified(reverse('user_list'))
+
+    def test_user_list_rows_not_modified(self):
+        self.assertNotModified(reverse('user_list_rows'))
+
+    def test_user_details_not_modified(self):
+        self.assertNotModified(reverse('user_details', args=['john']))
+
+    def test_user_details_last_modified(self):
+        url = reverse('user_details', args=['john'])
+        response = self.client.get(url)
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_export_not_modified(self):
+        self.assertNotModified(reverse('export_user_csv'))
+
+    def test_changed_user_is_modified(self):
+        for url in (reverse('user_list'),
+                    reverse('user_details', args=['john']),
+                    reverse('export_user_csv')):
+            etag = self.client.get(url)['ETag']
+            User.objects.filter(pk=self.user.pk).update(random_number=3)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, msg=url)
+
+    def test_new_user_is_modified(self):
+        etag = self.client.get(reverse('export_user_csv'))['ETag']
+        User.objects.create_user('paul', 'paul@thebeatles.com', 'foo')
+        response = self.client.get(reverse('export_user_csv'),
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_new_login_is_modified(self):
+        # the pages embed a CSRF token that a new login rotates, even when
+        # the viewer is not one of the users shown
+        User.objects.create_user('paul', 'paul@thebeatles.com', 'foo')
+        for url in (reverse('user_list') + '?after={}'.format(self.user.pk),
+                    reverse('user_details', args=['paul'])):
+            self.client.get(url)
+            response = self.client.get(url)
+            self.client.logout()
+            self.client.login(username='john', password='johnpassword')
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'],
+                HTTP_IF_MODIFIED_SINCE=response.get('Last-Modified', ''))
+            self.assertEqual(response.status_code, 200, msg=url)
+
+    def test_renamed_viewer_is_modified(self):
+        User.objects.create_user('paul', 'paul@thebeatles.com', 'foo')
+        url = reverse('user_list') + '?after={}'.format(self.user.pk)
+        self.client.get(url)
+        etag = self.client.get(url)['ETag']
+        User.objects.filter(pk=self.user.pk).update(username='johnny')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_other_viewer_is_modified(self):
+        url = reverse('user_details', args=['john'])
+        etag = self.client.get(url)['ETag']
+        User.objects.create_user('paul', 'paul@thebeatles.com', 'foo')
+        self.client.login(username='paul', password='foo')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
 class UserEditViewTest(TestCase):
     """Test user edit view."""
 
@@ -287,6 +589,19 @@ class UserDeleteViewTest(TestCase):
         messages = [m.message for m in get_messages(response.wsgi_request)]
         self.assertIn('User successfully deleted!', messages)
 
+    def test_post_view_soft_deletes_user(self):
+        self.client.post(reverse('user_delete'))
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertIsNotNone(self.user.deleted_at)
+        response = self.client.get(reverse('user_list'))
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(USER_SOFT_DELETE=False)
+    def test_post_view_hard_deletes_user(self):
+        self.client.post(reverse('user_delete'))
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+
 
 class ExportUserCSVViewTest(TestCase):
     """Test user list export view."""
@@ -319,9 +634,887 @@ class ExportUserCSVViewTest(TestCase):
     def test_csv_export(self):
         response = self.client.get('/download/')
         self.assertEqual(response.status_code, 200)
-        content = response.content.decode('utf-8')
+        content = b''.join(response.streaming_content).decode('utf-8')
         cvs_reader = csv.reader(io.StringIO(content))
         body = list(cvs_reader)
         self.assertIn('john', body[1])
         self.assertEqual(body.pop(0), ['Username', 'Birthday', 'Eligible',
                                        'Random Number', 'BizzFuzz'])
+
+    def test_csv_export_is_streamed(self):
+        response = self.client.get('/download/')
+        self.assertTrue(response.streaming)
+        self.assertIn('_user_list.csv', response['Content-Disposition'])
+
+    def test_csv_export_skips_staff_and_inactive_users(self):
+        User.objects.create_user(username='staff', email='s@s.com',
+                                 password='foo', is_staff=True)
+        User.objects.create_user(username='gone', email='g@g.com',
+                                 password='foo', is_active=False)
+        User.objects.create_user(username='paul', email='p@p.com',
+                                 password='foo',
+                                 birth_date=datetime.date(1942, 6, 18),
+                                 random_number=15)
+        response = self.client.get('/download/')
+        content = b''.join(response.streaming_content).decode('utf-8')
+        body = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(len(body), 3)
+        self.assertIn(['paul', '1942-06-18', 'Allowed', '15', 'BizzFuzz'],
+                      body)
+
+    def test_csv_export_filtered_by_eligibility(self):
+        User.objects.create_user(username='paul', email='p@p.com',
+                                 password='foo',
+                                 birth_date=datetime.date(1942, 6, 18))
+        response = self.client.get('/download/', {'eligible': 'Allowed'})
+        content = b''.join(response.streaming_content).decode('utf-8')
+        body = list(csv.reader(io.StringIO(content)))
+        self.assertEqual([row[0] for row in body[1:]], ['paul'])
+        self.assertEqual(body[1][2], 'Allowed')
+
+    def test_gzipped_csv_export(self):
+        response = self.client.get('/download/', {'format': 'csv.gz'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('_user_list.csv.gz', response['Content-Disposition'])
+        content = gzip.decompress(b''.join(response.streaming_content))
+        body = list(csv.reader(io.StringIO(content.decode('utf-8'))))
+        self.assertEqual(body[0][0], 'Username')
+        self.assertEqual(body[1][0], 'john')
+
+    def test_ndjson_export(self):
+        User.objects.create_user(username='paul', email='p@p.com',
+                                 password='foo',
+                                 birth_date=datetime.date(1942, 6, 18),
+                                 random_number=7)
+        response = self.client.get('/download/', {'format': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('_user_list.ndjson"', response['Content-Disposition'])
+        content = b''.join(response.streaming_content).decode('utf-8')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertIn({'username': 'paul', 'birth_date': '1942-06-18',
+                       'eligible': 'Allowed', 'random_number': 7,
+                       'bizz_fuzz': 7}, rows)
+
+    def test_gzipped_ndjson_export(self):
+        response = self.client.get('/download/', {'format': 'ndjson.gz'})
+        content = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(json.loads(content)['username'], 'john')
+
+    def test_unknown_export_format_falls_back_to_csv(self):
+        response = self.client.get('/download/', {'format': 'xml'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+
+    def test_export_etag_depends_on_format(self):
+        response = self.client.get('/download/')
+        response = self.client.get('/download/', {'format': 'csv.gz'},
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_gzip_export_is_compressed_incrementally(self):
+        chunks = ('{},{}\n'.format(i, os.urandom(16).hex())
+                  for i in range(20000))
+        compressed = list(exports.iter_user_export([], 'csv.gz'))
+        self.assertEqual(gzip.decompress(b''.join(compressed)),
+                         b'Username,Birthday,Eligible,Random Number,'
+                         b'BizzFuzz\r\n')
+        compressed = list(compression.iter_compress(
+            (chunk.encode() for chunk in chunks), 'gzip'))
+        self.assertGreater(len(compressed), 2)
+        self.assertEqual(
+            gzip.decompress(b''.join(compressed)).count(b'\n'), 20000)
+
+
+class ExportJobViewTest(TestCase):
+    """Test background user list export views."""
+
+    def setUp(self):
+        self.export_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.export_root)
+        settings_override = override_settings(EXPORT_ROOT=self.export_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(
+            username='john', email='lennon@thebeatles.com',
+            birth_date=datetime.date(1940, 10, 9), password='johnpassword')
+        self.client.login(username='john', password='johnpassword')
+
+    def test_create_job_for_anonymous_user(self):
+        self.client.logout()
+        response = self.client.post(reverse('export_job_create'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_create_job_requires_post(self):
+        response = self.client.get(reverse('export_job_create'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_create_job(self):
+        response = self.client.post(reverse('export_job_create') +
+                                    '?eligible=Allowed')
+        self.assertEqual(response.status_code, 202)
+        job = ExportJob.objects.get()
+        self.assertEqual(job.user, self.user)
+        self.assertEqual(job.eligible, 'Allowed')
+        self.assertEqual(response.json()['status'], 'pending')
+        self.assertEqual(response['Location'],
+                         reverse('export_job_status', args=[job.pk]))
+
+    def test_job_releases_the_router_pin(self):
+        # the job's writes pin the worker thread, which serves other jobs
+        job = ExportJob.objects.create(user=self.user)
+        self.addCleanup(routers.unpin)
+        exports.run_export_job(job.pk)
+        self.assertFalse(routers.is_pinned())
+
+    def test_status_and_download_of_finished_job(self):
+        job = ExportJob.objects.create(user=self.user)
+        exports.run_export_job(job.pk)
+        response = self.client.get(reverse('export_job_status',
+                                           args=[job.pk]))
+        self.assertEqual(response.json()['status'], 'done')
+        download_url = response.json()['download_url']
+        response = self.client.get(download_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('_user_list.csv', response['Content-Disposition'])
+        content = b''.join(response.streaming_content).decode('utf-8')
+        response.close()
+        body = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(body[1][:3], ['john', '1940-10-09', 'Allowed'])
+
+    def test_pending_job_cannot_be_downloaded(self):
+        job = ExportJob.objects.create(user=self.user)
+        response = self.client.get(reverse('export_job_download',
+                                           args=[job.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_job_of_another_user_is_hidden(self):
+        other = User.objects.create_user('paul', 'paul@thebeatles.com', 'foo')
+        job = ExportJob.objects.create(user=other)
+        response = self.client.get(reverse('export_job_status',
+                                           args=[job.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_run_export_jobs_command_deletes_expired_jobs(self):
+        job = ExportJob.objects.create(user=self.user)
+        call_command('run_export_jobs', stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.DONE)
+        self.assertTrue(os.path.exists(job.path))
+        ExportJob.objects.filter(pk=job.pk).update(
+            created_at=timezone.now() - datetime.timedelta(days=2))
+        call_command('run_export_jobs', stdout=io.StringIO())
+        self.assertFalse(ExportJob.objects.exists())
+        self.assertFalse(os.path.exists(job.path))
+
+    def make_dead_job(self, age):
+        """Return a job left running by a process that died age ago."""
+        started_at = timezone.now() - age
+        job = ExportJob.objects.create(user=self.user)
+        ExportJob.objects.filter(pk=job.pk).update(
+            status=ExportJob.RUNNING, started_at=started_at,
+            created_at=started_at)
+        with open(exports.get_partial_path(job.pk), 'w') as partial_file:
+            partial_file.write('Username\r\n')
+        return job
+
+    def test_run_export_jobs_command_retries_dead_jobs(self):
+        job = self.make_dead_job(datetime.timedelta(hours=2))
+        running = self.make_dead_job(datetime.timedelta(minutes=1))
+        call_command('run_export_jobs', stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.DONE)
+        self.assertFalse(os.path.exists(exports.get_partial_path(job.pk)))
+        running.refresh_from_db()
+        self.assertEqual(running.status, ExportJob.RUNNING)
+
+    def test_dead_jobs_are_deleted_after_retention(self):
+        job = self.make_dead_job(datetime.timedelta(days=2))
+        self.assertEqual(exports.delete_expired_export_jobs(), 1)
+        self.assertFalse(ExportJob.objects.exists())
+        self.assertFalse(os.path.exists(exports.get_partial_path(job.pk)))
+
+    def test_running_jobs_are_kept_within_timeout(self):
+        with self.settings(EXPORT_JOB_TIMEOUT=3 * 24 * 60 * 60):
+            self.make_dead_job(datetime.timedelta(days=2))
+            self.assertEqual(exports.delete_expired_export_jobs(), 0)
+
+
+class UserApiViewTest(TestCase):
+    """Test the read-only JSON user API."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='john', email='lennon@thebeatles.com',
+            birth_date=datetime.date(1940, 10, 9), password='johnpassword',
+            random_number=15)
+        User.objects.create_user(
+            username='kid', email='kid@thebeatles.com',
+            birth_date=datetime.date.today(), password='foo',
+            random_number=7)
+        self.client.login(username='john', password='johnpassword')
+
+    def test_list_for_anonymous_user(self):
+        self.client.logout()
+        response = self.client.get(reverse('user_api_list'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_list(self):
+        response = self.client.get(reverse('user_api_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'results': [
+                {'id': self.user.pk, 'username': 'john',
+                 'birth_date': '1940-10-09', 'eligible': 'Allowed',
+                 'random_number': 15, 'bizz_fuzz': 'BizzFuzz'},
+                {'id': self.user.pk + 1, 'username': 'kid',
+                 'birth_date': datetime.date.today().isoformat(),
+                 'eligible': 'Blocked', 'random_number': 7,
+                 'bizz_fuzz': 7},
+            ],
+            'next': None})
+
+    def test_list_field_projection(self):
+        response = self.client.get(reverse('user_api_list'),
+                                   {'fields': 'username,bizz_fuzz'})
+        self.assertEqual(response.json()['results'],
+                         [{'username': 'john', 'bizz_fuzz': 'BizzFuzz'},
+                          {'username': 'kid', 'bizz_fuzz': 7}])
+
+    def test_list_unknown_field(self):
+        response = self.client.get(reverse('user_api_list'),
+                                   {'fields': 'username,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(),
+                         {'error': 'Unknown fields: password.'})
+
+    def test_list_pagination(self):
+        response = self.client.get(reverse('user_api_list'),
+                                   {'fields': 'username', 'page_size': 1})
+        self.assertEqual(response.json()['results'], [{'username': 'john'}])
+        response = self.client.get(response.json()['next'])
+        self.assertEqual(response.json(),
+                         {'results': [{'username': 'kid'}], 'next': None})
+
+    def test_batch(self):
+        with self.assertNumQueries(3):
+            # session and user lookups, then the batch itself
+            response = self.client.get(
+                reverse('user_api_batch'),
+                {'usernames': 'kid,nobody,john', 'fields': 'eligible'})
+        self.assertEqual(response.json(), {
+            'results': [{'eligible': 'Blocked'}, {'eligible': 'Allowed'}],
+            'missing': ['nobody']})
+        response = self.client.get(
+            reverse('user_api_batch'),
+            {'usernames': 'john,kid', 'fields': 'eligible,username'})
+        self.assertEqual(response.json()['results'], [
+            {'eligible': 'Allowed', 'username': 'john'},
+            {'eligible': 'Blocked', 'username': 'kid'}])
+
+    def test_batch_too_many_usernames(self):
+        usernames = ','.join('user{}'.format(i) for i in range(501))
+        response = self.client.get(reverse('user_api_batch'),
+                                   {'usernames': usernames})
+        self.assertEqual(response.status_code, 400)
+
+
+class MetricsViewTest(TestCase):
+    """Test request metrics and their Prometheus endpoint."""
+
+    def setUp(self):
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir)
+        settings_override = override_settings(
+            METRICS_DB=os.path.join(metrics_dir, 'metrics.sqlite3'),
+            METRICS_FLUSH_INTERVAL=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user('john', 'lennon@thebeatles.com',
+                                             'johnpassword', is_staff=True)
+        self.client.login(username='john', password='johnpassword')
+
+    def test_get_view_for_non_staff_user(self):
+        User.objects.filter(pk=self.user.pk).update(is_staff=False)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_get_view_reports_requests_per_view(self):
+        self.client.get(reverse('user_list'))
+        self.client.get(reverse('user_list'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'],
+                         'text/plain; version=0.0.4')
+        content = response.content.decode()
+        self.assertIn('django_http_requests_total{view="user_list"} 2',
+                      content)
+        self.assertIn('django_http_request_duration_seconds_count'
+                      '{view="user_list"} 2', content)
+        self.assertIn('django_http_request_duration_seconds_bucket'
+                      '{view="user_list",le="+Inf"} 2', content)
+        self.assertIn('django_sql_queries_total{view="user_list"}', content)
+
+    def test_streamed_response_is_measured_when_consumed(self):
+        response = self.client.get(reverse('export_user_csv'))
+        size = sum(len(chunk) for chunk in response.streaming_content)
+        content = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('django_http_response_bytes_total'
+                      '{{view="export_user_csv"}} {}'.format(size), content)
+
+    def test_file_response_is_left_to_the_file_wrapper(self):
+        # the test client wraps every stream itself, so the middleware
+        # are called directly
+        def send_file(request):
+            return FileResponse(open(__file__, 'rb'), content_type='text/csv')
+
+        handler = MetricsMiddleware(CompressionMiddleware(
+            routers.ReplicaPinMiddleware(send_file)))
+        response = handler(RequestFactory().get(
+            '/', HTTP_ACCEPT_ENCODING='gzip'))
+        response.close()
+        self.assertIsNotNone(response.file_to_stream)
+        self.assertNotIn('Content-Encoding', response)
+        content = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('django_http_response_bytes_total'
+                      '{{view="<unresolved>"}} {}'.format(
+                          os.path.getsize(__file__)), content)
+
+    def test_unwritable_file_keeps_metrics(self):
+        registry = metrics.MetricsRegistry()
+        missing = os.path.join(tempfile.gettempdir(), 'missing', 'm.sqlite3')
+        with self.settings(METRICS_DB=missing), \
+                self.assertLogs('management_tool.metrics', 'ERROR'):
+            registry.record('home', 0.001, 1, 0.0001, 100)
+            self.assertEqual(registry.collect()['home']['requests'], 1)
+        self.assertEqual(registry.collect()['home']['requests'], 1)
+
+    def test_processes_are_merged(self):
+        first, second = metrics.MetricsRegistry(), metrics.MetricsRegistry()
+        first.record('home', 0.001, 1, 0.0001, 100)
+        second.record('home', 0.2, 2, 0.0002, 50)
+        totals = first.collect()['home']
+        self.assertEqual(totals['requests'], 2)
+        self.assertEqual(totals['queries'], 3)
+        self.assertEqual(totals['bytes'], 150)
+        self.assertEqual(totals['bucket:0.005'], 1)
+        self.assertEqual(totals['bucket:0.25'], 1)
+
+
+class UserSearchViewTest(TestCase):
+    """Test user list search and username autocomplete."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('john', 'lennon@thebeatles.com',
+                                             'johnpassword')
+        User.objects.create_user('johnny', 'cash@sun.com', 'foo')
+        User.objects.create_user('paul', 'paul@thebeatles.com', 'foo')
+        self.client.login(username='john', password='johnpassword')
+
+    def test_user_list_search(self):
+        response = self.client.get(reverse('user_list'), {'q': 'sun'})
+        self.assertEqual([u.username for u in response.context['user_list']],
+                         ['johnny'])
+        self.assertContains(response, 'value="sun"')
+
+    def test_autocomplete(self):
+        response = self.client.get(reverse('user_autocomplete'),
+                                   {'q': 'jo'})
+        self.assertEqual(response.json(), {'results': ['john', 'johnny']})
+
+    def test_autocomplete_limit(self):
+        response = self.client.get(reverse('user_autocomplete'),
+                                   {'q': 'thebeatles', 'limit': 1})
+        self.assertEqual(response.json(), {'results': ['john']})
+
+    def test_autocomplete_without_query(self):
+        response = self.client.get(reverse('user_autocomplete'))
+        self.assertEqual(response.json(), {'results': []})
+
+    def test_autocomplete_for_anonymous_user(self):
+        self.client.logout()
+        response = self.client.get(reverse('user_autocomplete'),
+                                   {'q': 'jo'})
+        self.assertEqual(response.status_code, 302)
+
+
+def import_production_settings(**environ):
+    sys.modules.pop('user_management_app.production_settings', None)
+    with mock.patch.dict(os.environ, environ):
+        return importlib.import_module(
+            'user_management_app.production_settings')
+
+
+class SQLiteProfileTest(TestCase):
+    """Test the SQLite pragmas applied to new connections."""
+
+    def setUp(self):
+        self.pragmas = import_production_settings(
+            DJANGO_SECRET_KEY='secret').SQLITE_PRAGMAS
+
+    def test_development_keeps_sqlite_defaults(self):
+        self.assertEqual(settings.SQLITE_PRAGMAS, {})
+        self.assertEqual(settings.DATABASES['default']['CONN_MAX_AGE'], 0)
+
+    def test_pragmas_are_applied_to_django_connections(self):
+        default = connections['default']
+        wrapper = default.__class__(default.settings_dict.copy())
+        self.addCleanup(wrapper.close)
+        with override_settings(SQLITE_PRAGMAS=self.pragmas):
+            with wrapper.cursor() as cursor:
+                cursor.execute('PRAGMA busy_timeout')
+                self.assertEqual(cursor.fetchone()[0], 5000)
+                cursor.execute('PRAGMA synchronous')
+                # NORMAL
+                self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_file_database_uses_wal(self):
+        with tempfile.TemporaryDirectory() as directory:
+            sqlite = database.connect(os.path.join(directory, 'test.db'),
+                                      self.pragmas)
+            self.assertEqual(
+                sqlite.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+            sqlite.close()
+
+    def test_bench_sqlite_command(self):
+        out = io.StringIO()
+        with override_settings(SQLITE_PRAGMAS=self.pragmas):
+            call_command('bench_sqlite', seconds=0.2, readers=1, rows=100,
+                         batch_size=10, stdout=out)
+        self.assertIn('production:', out.getvalue())
+        self.assertIn('read speedup', out.getvalue())
+
+    def test_bench_sqlite_requires_pragmas(self):
+        with self.assertRaises(CommandError):
+            call_command('bench_sqlite', seconds=0.2)
+
+
+@override_settings(DATABASE_REPLICAS=['reader'])
+class PrimaryReplicaRouterTest(TestCase):
+    """Test the routing of reads to replicas and of writes to the primary."""
+
+    def setUp(self):
+        routers.unpin()
+        self.addCleanup(routers.unpin)
+        self.router = routers.PrimaryReplicaRouter()
+
+    def test_reads_go_to_replicas_and_writes_to_primary(self):
+        self.assertEqual(self.router.db_for_read(User), 'reader')
+        self.assertEqual(self.router.db_for_write(User), 'default')
+
+    def test_reads_follow_a_write_to_the_primary(self):
+        self.router.db_for_write(User)
+        self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_replicas_mirroring_the_primary_are_skipped(self):
+        with self.settings(DATABASE_REPLICAS=['default']):
+            self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_replicas_are_not_migrated(self):
+        self.assertTrue(self.router.allow_migrate('default', 'users'))
+        self.assertFalse(self.router.allow_migrate('reader', 'users'))
+
+    def test_middleware_pins_client_after_a_write(self):
+        def write(request):
+            self.router.db_for_write(User)
+            return HttpResponse()
+
+        middleware = routers.ReplicaPinMiddleware(write)
+        response = middleware(RequestFactory().get('/'))
+        cookie = response.cookies[routers.PIN_COOKIE_NAME]
+        self.assertEqual(cookie['max-age'], 5)
+        self.assertFalse(routers.is_pinned())
+
+    def test_middleware_reads_primary_while_pinned(self):
+        def read(request):
+            return HttpResponse(self.router.db_for_read(User))
+
+        middleware = routers.ReplicaPinMiddleware(read)
+        request = RequestFactory().get('/')
+        self.assertEqual(middleware(request).content, b'reader')
+        request.COOKIES[routers.PIN_COOKIE_NAME] = '1'
+        response = middleware(request)
+        self.assertEqual(response.content, b'default')
+        self.assertNotIn(routers.PIN_COOKIE_NAME, response.cookies)
+
+    def test_streamed_body_reads_primary_while_pinned(self):
+        def read(request):
+            return StreamingHttpResponse(
+                self.router.db_for_read(User) for i in range(1))
+
+        middleware = routers.ReplicaPinMiddleware(read)
+        request = RequestFactory().get('/')
+        request.COOKIES[routers.PIN_COOKIE_NAME] = '1'
+        response = middleware(request)
+        self.assertFalse(routers.is_pinned())
+        self.assertEqual(b''.join(response.streaming_content), b'default')
+        response.close()
+        self.assertFalse(routers.is_pinned())
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class SeparateReplicaTest(TestCase):
+    """Test writes while reads go to a replica holding another database."""
+
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        # the replica has the schema but lags behind, it holds no users
+        cls.directory = tempfile.mkdtemp()
+        connections.databases['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.directory, 'replica.db'),
+        }
+        primary = connections['default']
+        primary.ensure_connection()
+        replica = database.connect(connections['replica'].settings_dict[
+            'NAME'])
+        primary.connection.backup(replica)
+        replica.close()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections.databases['replica']
+        del connections._connections.replica
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        routers.unpin()
+        self.addCleanup(routers.unpin)
+
+    def test_expression_update_fixes_up_the_primary(self):
+        User.objects.create_user('john', password='foo', random_number=1)
+        routers.unpin()
+        self.assertFalse(User.objects.exists())
+        User.objects.update(random_number=F('random_number') + 2)
+        user = User.objects.using('default').get()
+        self.assertEqual(user.random_number, 3)
+        self.assertEqual(user.bizz_fuzz, 'Bizz')
+
+
+class SyncReplicasCommandTest(TestCase):
+    """Test the SQLite replica sync command."""
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_sync_requires_replicas(self):
+        with self.assertRaises(CommandError):
+            call_command('sync_replicas')
+
+    def test_copy_primary_into_replica(self):
+        with tempfile.TemporaryDirectory() as directory:
+            primary = os.path.join(directory, 'primary.db')
+            replica = os.path.join(directory, 'replica.db')
+            sqlite = database.connect(primary)
+            sqlite.execute('CREATE TABLE t (x INTEGER)')
+            sqlite.execute('INSERT INTO t VALUES (1)')
+            sync_replicas.Command().copy(primary, replica)
+            sqlite.close()
+            sqlite = database.connect(replica)
+            self.assertEqual(sqlite.execute('SELECT x FROM t').fetchall(),
+                             [(1,)])
+            sqlite.close()
+
+
+class StaticFilesTest(TestCase):
+    """Test the collected static files and the handler serving them."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = tempfile.mkdtemp()
+        storage = ('management_tool.storage.'
+                   'CompressedManifestStaticFilesStorage')
+        with override_settings(STATIC_ROOT=cls.static_root,
+                               STATICFILES_STORAGE=storage):
+            call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(cls.static_root, 'staticfiles.json')) as f:
+            cls.manifest = json.load(f)['paths']
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.static_root)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.handler = StaticFilesHandler(self.fallback, self.static_root,
+                                          '/static/', max_age=60)
+
+    @staticmethod
+    def fallback(environ, start_response):
+        start_response('404 Not Found', [])
+        return [b'fallback']
+
+    def get(self, path, **environ):
+        environ.update(PATH_INFO=path, REQUEST_METHOD=environ.get(
+            'REQUEST_METHOD', 'GET'))
+        response = {}
+
+        def start_response(status, headers):
+            response['status'] = status
+            response['headers'] = dict(headers)
+
+        response['content'] = b''.join(self.handler(environ,
+                                                    start_response))
+        return response
+
+    def test_collectstatic_writes_hashed_compressed_files(self):
+        hashed_name = self.manifest['management_tool/css/style.css']
+        self.assertNotEqual(hashed_name, 'management_tool/css/style.css')
+        path = os.path.join(self.static_root, hashed_name)
+        with open(path, 'rb') as f, gzip.open(path + '.gz') as compressed:
+            self.assertEqual(compressed.read(), f.read())
+        self.assertTrue(os.path.isfile(path + '.br'))
+
+    def test_incompressible_file_has_no_variants(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'random.bin')
+            with open(path, 'wb') as f:
+                f.write(os.urandom(1024))
+            self.assertEqual(compress_file(path), [])
+            self.assertFalse(os.path.exists(path + '.gz'))
+
+    def test_serve_brotli_variant(self):
+        hashed_name = self.manifest['management_tool/css/style.css']
+        response = self.get('/static/' + hashed_name,
+                            HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        headers = response['headers']
+        self.assertEqual(response['status'], '200 OK')
+        self.assertEqual(headers['Content-Encoding'], 'br')
+        self.assertEqual(headers['Content-Type'], 'text/css; charset=utf-8')
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(headers['Cache-Control'],
+                         'public, max-age=31536000, immutable')
+        self.assertEqual(int(headers['Content-Length']),
+                         len(response['content']))
+
+    def test_serve_gzip_variant(self):
+        hashed_name = self.manifest['management_tool/css/style.css']
+        response = self.get('/static/' + hashed_name,
+                            HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(response['headers']['Content-Encoding'], 'gzip')
+        with open(os.path.join(self.static_root, hashed_name), 'rb') as f:
+            self.assertEqual(gzip.decompress(response['content']), f.read())
+
+    def test_serve_unhashed_file_uncompressed(self):
+        response = self.get('/static/management_tool/css/style.css')
+        headers = response['headers']
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual(headers['Cache-Control'], 'public, max-age=60')
+
+    def test_not_modified(self):
+        path = '/static/management_tool/css/style.css'
+        last_modified = self.get(path)['headers']['Last-Modified']
+        response = self.get(path, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response['status'], '304 Not Modified')
+        self.assertEqual(response['content'], b'')
+
+    def test_head(self):
+        response = self.get('/static/management_tool/css/style.css',
+                            REQUEST_METHOD='HEAD')
+        self.assertEqual(response['status'], '200 OK')
+        self.assertEqual(response['content'], b'')
+
+    def test_fall_through(self):
+        for path in ('/static/missing.css', '/static/../settings.py',
+                     '/users/'):
+            response = self.get(path)
+            self.assertEqual(response['content'], b'fallback')
+
+    def test_base_template_has_no_external_assets(self):
+        response = self.client.get(reverse('home'))
+        self.assertNotIn(b'https://', response.content)
+        self.assertContains(response, '/static/management_tool/vendor/')
+
+    def test_signup_uses_native_date_input(self):
+        response = self.client.get(reverse('signup'))
+        self.assertContains(response, 'type="date"')
+
+
+class CompressionMiddlewareTest(TestCase):
+    """Test the response compression middleware."""
+
+    def get(self, response, accept_encoding='gzip, deflate, br'):
+        middleware = CompressionMiddleware(lambda request: response)
+        request = RequestFactory().get(
+            '/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return middleware(request)
+
+    def test_choose_encoding(self):
+        self.assertEqual(compression.choose_encoding('gzip, br'), 'br')
+        self.assertEqual(compression.choose_encoding('gzip, br;q=0'),
+                         'gzip')
+        self.assertIsNone(compression.choose_encoding('identity'))
+        with mock.patch.object(compression, 'brotli', None):
+            self.assertEqual(compression.choose_encoding('br, gzip'),
+                             'gzip')
+
+    def test_compress_html(self):
+        content = b'<tr><td>user</td></tr>' * 100
+        response = HttpResponse(content)
+        response['ETag'] = '"abc"'
+        response = self.get(response, 'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        self.assertEqual(int(response['Content-Length']),
+                         len(response.content))
+        self.assertEqual(gzip.decompress(response.content), content)
+
+    def test_compress_brotli(self):
+        content = b'<tr><td>user</td></tr>' * 100
+        response = self.get(HttpResponse(content))
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(response.content),
+                         content)
+
+    def test_compress_stream(self):
+        lines = [b'user%d,1990-01-01,Allowed\r\n' % i for i in range(500)]
+        response = self.get(StreamingHttpResponse(
+            iter(lines), content_type='text/csv'), 'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response)
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)),
+            b''.join(lines))
+
+    def test_skip_small_response(self):
+        response = self.get(HttpResponse(b'<p>small</p>'))
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_skip_unaccepted_encoding(self):
+        response = self.get(HttpResponse(b'x' * 2000), 'identity')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_skip_compressed_content_type(self):
+        response = self.get(StreamingHttpResponse(
+            iter([b'x' * 2000]), content_type='application/gzip'))
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_user_list_is_compressed(self):
+        User.objects.create_user('john', 'lennon@thebeatles.com',
+                                 'johnpassword')
+        self.client.login(username='john', password='johnpassword')
+        response = self.client.get(reverse('user_list'),
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'john', gzip.decompress(response.content))
+
+    def test_bench_command(self):
+        out = io.StringIO()
+        call_command('bench_compression', users=50, stdout=out)
+        self.assertIn('csv export', out.getvalue())
+
+
+@override_settings(THROTTLE_RATES={
+    'login': {'ip': (3, 60), 'identity': (2, 60)},
+    'signup': {'ip': (2, 60)},
+})
+class ThrottleTest(TestCase):
+    """Test the token bucket throttling of login and signup."""
+
+    def setUp(self):
+        throttling.get_cache().clear()
+
+    def login(self, username, address='127.0.0.1'):
+        return self.client.post(reverse('login'),
+                                {'username': username, 'password': 'wrong'},
+                                REMOTE_ADDR=address)
+
+    def test_bucket_refills(self):
+        key = throttling.get_bucket_key('login', 'ip', '127.0.0.1')
+        self.assertEqual(throttling.take_token(key, 2, 10, now=100), 0)
+        self.assertEqual(throttling.take_token(key, 2, 10, now=100), 0)
+        self.assertAlmostEqual(throttling.take_token(key, 2, 10, now=100), 5)
+        self.assertAlmostEqual(throttling.take_token(key, 2, 10, now=102), 3)
+        self.assertEqual(throttling.take_token(key, 2, 10, now=105), 0)
+
+    def test_login_throttled_per_address(self):
+        for i in range(3):
+            self.assertEqual(self.login('user{}'.format(i)).status_code, 200)
+        response = self.login('user3')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '20')
+        self.assertEqual(self.login('user3', '10.0.0.2').status_code, 200)
+
+    def test_login_throttled_per_username(self):
+        self.assertEqual(self.login('John', '10.0.0.1').status_code, 200)
+        self.assertEqual(self.login('john', '10.0.0.2').status_code, 200)
+        self.assertEqual(self.login('john ', '10.0.0.3').status_code, 429)
+        self.assertEqual(self.login('paul', '10.0.0.3').status_code, 200)
+
+    def test_get_not_throttled(self):
+        for i in range(5):
+            self.assertEqual(self.client.get(reverse('signup')).status_code,
+                             200)
+
+    def test_signup_throttled(self):
+        for i in range(2):
+            self.client.post(reverse('signup'), {'username': 'x'})
+        response = self.client.post(reverse('signup'), {'username': 'x'})
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(THROTTLE_ENABLED=False)
+    def test_disabled(self):
+        for i in range(5):
+            self.assertEqual(self.login('john').status_code, 200)
+
+
+class BenchThrottleTest(TransactionTestCase):
+    """Test the login flood load test."""
+
+    def test_run_bench(self):
+        report = bench_throttle.Command().run_bench(0.5, 1, 20)
+        self.assertGreater(report['baseline']['page_requests'], 0)
+        self.assertEqual(report['flood']['login_throttled'], 0)
+        self.assertGreater(report['flood_throttled']['login_attempts'], 0)
+
+
+class ProductionSettingsTest(TestCase):
+    """Test the production settings and the worker warm-up."""
+
+    def test_production_settings(self):
+        production = import_production_settings(
+            DJANGO_SECRET_KEY='secret', DJANGO_ALLOWED_HOSTS='a.com,b.com')
+        self.assertFalse(production.DEBUG)
+        self.assertEqual(production.SECRET_KEY, 'secret')
+        self.assertEqual(production.ALLOWED_HOSTS, ['a.com', 'b.com'])
+        self.assertTrue(production.WSGI_WARM_UP)
+        self.assertEqual(production.SQLITE_PRAGMAS['journal_mode'], 'wal')
+        self.assertEqual(production.DATABASES['default']['CONN_MAX_AGE'], 60)
+        options = production.TEMPLATES[0]['OPTIONS']
+        self.assertEqual(options['loaders'][0][0],
+                         'django.template.loaders.cached.Loader')
+        # the development settings are left as they are
+        self.assertNotIn('loaders', settings.TEMPLATES[0]['OPTIONS'])
+
+    def test_production_settings_require_secret_key(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop('DJANGO_SECRET_KEY', None)
+            with self.assertRaises(ImproperlyConfigured):
+                import_production_settings()
+
+    def test_template_names(self):
+        names = warmup.get_template_names()
+        self.assertIn('management_tool/base.html', names)
+        self.assertIn('registration/login.html', names)
+
+    def test_warm_up(self):
+        production = import_production_settings(DJANGO_SECRET_KEY='secret')
+        with override_settings(TEMPLATES=production.TEMPLATES):
+            report = warmup.warm_up()
+            loader = engines['django'].engine.template_loaders[0]
+            self.assertEqual(len(loader.get_template_cache),
+                             report['templates']['count'])
+        self.assertEqual(report['databases']['count'],
+                         len(settings.DATABASES))
+        self.assertGreater(report['urls']['count'], 10)
+
+    def test_bench_command(self):
+        out = io.StringIO()
+        call_command('bench_warmup', runs=1, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['warm']['statuses'], ['200 OK'])
+        self.assertEqual(report['cold']['statuses'], ['200 OK'])
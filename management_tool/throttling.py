@@ -0,0 +1,88 @@
+import functools
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+
+def get_cache():
+    return caches['throttle']
+
+
+def get_bucket_key(scope, kind, value):
+    """Return the cache key of a bucket.
+
+    The value is hashed, user supplied names may hold any character and
+    have any length.
+    """
+    digest = hashlib.md5(value.encode('utf-8')).hexdigest()
+    return 'throttle:{}:{}:{}'.format(scope, kind, digest)
+
+
+def take_token(key, capacity, period, now=None):
+    """Take a token from a bucket, return the seconds to wait if empty.
+
+    A bucket holds up to capacity tokens and gains capacity tokens per
+    period seconds, so bursts up to capacity are let through and the
+    sustained rate is capacity per period. The state is read and written
+    without a lock, so concurrent requests may both take the last token.
+    """
+    cache = get_cache()
+    now = time.time() if now is None else now
+    rate = capacity / period
+    tokens, updated = cache.get(key, (capacity, now))
+    tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens < 1:
+        return (1 - tokens) / rate
+    # a full bucket is the same as a missing one, so the key can expire
+    cache.set(key, (tokens - 1, now), math.ceil(period))
+    return 0
+
+
+def get_client_ip(request):
+    return request.META.get('REMOTE_ADDR') or ''
+
+
+def check_throttle(request, scope, field=None):
+    """Return the seconds a request has to wait, 0 when it may go on."""
+    rates = settings.THROTTLE_RATES.get(scope, {})
+    buckets = [('ip', get_client_ip(request))]
+    if field:
+        identity = request.POST.get(field, '').strip().lower()
+        if identity:
+            buckets.append((field, identity))
+    for kind, value in buckets:
+        rate = rates.get('ip' if kind == 'ip' else 'identity')
+        if rate is None:
+            continue
+        wait = take_token(get_bucket_key(scope, kind, value), *rate)
+        if wait:
+            return wait
+    return 0
+
+
+def throttle(scope, field=None):
+    """Limit the POST requests of a view per client IP and identity.
+
+    The identity is the value of the given form field, such as the
+    username of a login attempt, so one account cannot be guessed at from
+    many addresses. Limits come from THROTTLE_RATES[scope] and throttled
+    requests get a 429 response with a Retry-After header.
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if request.method == 'POST' and settings.THROTTLE_ENABLED:
+                wait = check_throttle(request, scope, field)
+                if wait:
+                    response = HttpResponse(
+                        'Too many attempts, please try again later.',
+                        content_type='text/plain', status=429)
+                    response['Retry-After'] = str(math.ceil(wait))
+                    return response
+            return view_func(request, *args, **kwargs)
+        return _wrapped_view
+    return decorator
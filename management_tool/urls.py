@@ -1,16 +1,36 @@
+from django.contrib.auth import views as auth_views
 from django.urls import path, include
 
 from . import views
+from .throttling import throttle
 
 urlpatterns = [
+    # the views of django.contrib.auth.urls that hash or send mail, throttled
+    path('login/', throttle('login', 'username')(
+        auth_views.LoginView.as_view()), name='login'),
+    path('password_reset/', throttle('password_reset', 'email')(
+        auth_views.PasswordResetView.as_view()), name='password_reset'),
     path('', include('django.contrib.auth.urls')),
     path('home/', views.home, name='home'),
     path('user/<username>/', views.user_details, name='user_details'),
     path('users/', views.user_list, name='user_list'),
+    path('users/rows/', views.user_list_rows, name='user_list_rows'),
 
     path('signup/', views.signup, name='signup'),
     path('edit/', views.user_edit, name='user_edit'),
     path('delete/', views.user_delete, name='user_delete'),
     path('download/', views.export_user_csv, name='export_user_csv'),
+    path('download/jobs/', views.export_job_create,
+         name='export_job_create'),
+    path('download/jobs/<int:pk>/', views.export_job_status,
+         name='export_job_status'),
+    path('download/jobs/<int:pk>/file/', views.export_job_download,
+         name='export_job_download'),
+
+    path('api/users/', views.user_api_list, name='user_api_list'),
+    path('api/users/batch/', views.user_api_batch, name='user_api_batch'),
+    path('api/users/autocomplete/', views.user_autocomplete,
+         name='user_autocomplete'),
+    path('metrics/', views.metrics_view, name='metrics'),
 
 ]
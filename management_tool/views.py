@@ -1,16 +1,27 @@
-import csv
 import datetime
+import hashlib
 
+from django.conf import settings
 from django.contrib import messages
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.http import StreamingHttpResponse
 from django.shortcuts import render, redirect
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
-from django.contrib.auth import login, authenticate
+from django.contrib.auth import login, logout
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.urls import reverse
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+from django.views.decorators.http import condition, require_POST
 
 from users.forms import CustomUserCreationForm, CustomUserChangeForm
-from .templatetags import eligible, bizz_fuzz
+from . import exports, fragments, metrics
+from .models import ExportJob
+from .renderers import DETAILS_ROW_FORMAT, ROW_FIELDS, UserRowRenderer
+from .throttling import throttle
 
 User = get_user_model()
 
@@ -22,17 +33,165 @@ def home(request):
                   {'section': 'home'})
 
 
+def get_int_param(request, name, default):
+    """Return a non-negative integer query parameter or the default."""
+    try:
+        value = int(request.GET.get(name, default))
+    except (TypeError, ValueError):
+        return default
+    return value if value >= 0 else default
+
+
+def get_eligible_param(request):
+    """Return the Allowed or Blocked eligibility filter of the request."""
+    value = request.GET.get('eligible')
+    return value if value in ('Allowed', 'Blocked') else None
+
+
+def get_export_format_param(request):
+    """Return the export format of the request, csv by default."""
+    value = request.GET.get('format')
+    return value if value in exports.EXPORT_FORMATS else 'csv'
+
+
+def get_search_param(request):
+    """Return the user search of the request."""
+    return request.GET.get('q', '').strip() or None
+
+
+def get_user_page_params(request):
+    """Return the cursor, page size and filters of a user list page."""
+    after = get_int_param(request, 'after', 0)
+    page_size = min(get_int_param(request, 'page_size',
+                                  settings.USER_LIST_PAGE_SIZE)
+                    or settings.USER_LIST_PAGE_SIZE,
+                    settings.USER_LIST_MAX_PAGE_SIZE)
+    return (after, page_size, get_eligible_param(request),
+            get_search_param(request))
+
+
+def get_user_page(request):
+    """Return a keyset page of active users and the cursor of the next one.
+
+    Users are ordered by primary key and the page starts after the ``after``
+    cursor, so neither an OFFSET scan nor a COUNT(*) query is needed.
+    """
+    after, page_size, eligible, search = get_user_page_params(request)
+    user_list = exports.get_active_users(eligible, search)
+    # fetch one extra row to know whether another page follows, updated_at
+    # versions the cached rows
+    user_list = list(user_list.filter(pk__gt=after).order_by('pk')
+                     .values_list(*ROW_FIELDS, 'updated_at', named=True)
+                     [:page_size + 1])
+    next_cursor = None
+    if len(user_list) > page_size:
+        user_list = user_list[:page_size]
+        next_cursor = user_list[-1].pk
+    return user_list, next_cursor, page_size
+
+
+def make_etag(*parts):
+    """Hash the parts a response depends on into an ETag."""
+    return hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+
+
+def get_viewer_state(request):
+    """Return what a page shows of the viewer, besides the users listed.
+
+    The header names the viewer and the forms embed a token derived from
+    the CSRF cookie, which a new login rotates.
+    """
+    return (request.user.pk, request.user.get_username(),
+            getattr(request.user, 'updated_at', None),
+            request.META.get('CSRF_COOKIE'))
+
+
+def user_list_etag(request):
+    """Return the ETag of a user list page from its users' timestamps.
+
+    The page depends on the viewer and on today's date as well, the
+    latter through eligibility.
+    """
+    after, page_size, eligible, search = get_user_page_params(request)
+    user_list = exports.get_active_users(eligible, search).filter(
+        pk__gt=after).order_by('pk').values_list('pk', 'updated_at')
+    return make_etag(request.path, get_viewer_state(request),
+                     datetime.date.today(), page_size, eligible, search,
+                     list(user_list[:page_size + 1]))
+
+
+def user_details_etag(request, username):
+    """Return the ETag of a user profile page."""
+    updated_at = user_details_last_modified(request, username)
+    if updated_at is None:
+        return None
+    return make_etag(get_viewer_state(request), datetime.date.today(),
+                     updated_at)
+
+
+def user_details_last_modified(request, username):
+    """Return when a user profile last changed, at the latest today.
+
+    Eligibility depends on the date, so the page changes at midnight. The
+    viewer's last change and login count too, a login rotates the CSRF
+    token embedded in the page.
+    """
+    updated_at = User.objects.filter(username=username,
+                                     is_active=True).values_list(
+        'updated_at', flat=True).first()
+    if updated_at is None:
+        return None
+    midnight = timezone.make_aware(datetime.datetime.combine(
+        datetime.date.today(), datetime.time.min))
+    viewer = request.user
+    return max(updated_at, midnight,
+               getattr(viewer, 'updated_at', None) or midnight,
+               getattr(viewer, 'last_login', None) or midnight)
+
+
+def export_user_csv_etag(request):
+    """Return the ETag of a user list export.
+
+    The number of users is hashed along with the latest change, so a
+    deleted user changes the ETag as well.
+    """
+    eligible = get_eligible_param(request)
+    state = exports.get_active_users(eligible).aggregate(
+        count=Count('pk'), updated_at=Max('updated_at'))
+    return make_etag(datetime.date.today(), eligible,
+                     get_export_format_param(request),
+                     state['count'], state['updated_at'])
+
+
 @login_required
+@condition(etag_func=user_list_etag)
 def user_list(request):
     """Display user list."""
-    user_list = User.objects.filter(is_staff=False,
-                                    is_active=True)
+    user_list, next_cursor, page_size = get_user_page(request)
     return render(request,
                   'management_tool/user_list.html',
                   {'user_list': user_list,
+                   'user_rows': fragments.render_user_rows(user_list),
+                   'next_cursor': next_cursor,
+                   'page_size': page_size,
+                   'eligible': get_eligible_param(request),
+                   'search': get_search_param(request),
                    'section': 'users'})
 
 
+@login_required
+@condition(etag_func=user_list_etag)
+def user_list_rows(request):
+    """Display only the table rows of the next user list page."""
+    user_list, next_cursor, page_size = get_user_page(request)
+    response = render(request,
+                      'management_tool/user_list_rows.html',
+                      {'user_list': user_list,
+                       'user_rows': fragments.render_user_rows(user_list)})
+    response['X-Next-Cursor'] = next_cursor or ''
+    return response
+
+
 @login_required
 def user_edit(request):
     """Display the edit form and handle the edit action."""
@@ -53,13 +212,19 @@ def user_edit(request):
 
 
 @login_required
+@condition(etag_func=user_details_etag,
+           last_modified_func=user_details_last_modified)
 def user_details(request, username):
     """Display user profile details."""
-    user_details = get_object_or_404(User, username=username,
-                                     is_active=True)
+    user_details = get_object_or_404(
+        User.objects.with_eligibility().values_list(*ROW_FIELDS, named=True),
+        username=username,
+        is_active=True)
+    user_row = UserRowRenderer(DETAILS_ROW_FORMAT).render(user_details)
     return render(request,
                   'management_tool/user_details.html',
                   {'user_details': user_details,
+                   'user_row': mark_safe(user_row),
                    'section': 'account'})
 
 
@@ -72,9 +237,14 @@ def user_delete(request):
     if (request.method == 'POST'
             and request.user.username == user_delete.username
             and request.user.is_authenticated):
-        # user_delete.is_active = False
-        # user_delete.save()
-        user_delete.delete()
+        if settings.USER_SOFT_DELETE:
+            # the row and its relations are removed by purge_deleted_users
+            user_delete.is_active = False
+            user_delete.deleted_at = timezone.now()
+            user_delete.save(update_fields=['is_active', 'deleted_at'])
+        else:
+            user_delete.delete()
+        logout(request)
         messages.success(request, "User successfully deleted!")
         return redirect('home')
 
@@ -83,20 +253,17 @@ def user_delete(request):
                   {'user_delete': user_delete})
 
 
+@throttle('signup', 'email')
 def signup(request):
     """Display the signup form and handle the signup action."""
     if request.method == 'POST':
         user_form = CustomUserCreationForm(request.POST)
         if user_form.is_valid():
-            new_user = user_form.save(commit=False)
-            raw_password = user_form.cleaned_data.get('password1')
-            new_user.set_password(raw_password)
-            # save a new user
-            new_user.save()
-            username = user_form.cleaned_data.get('username')
-            # authenticate and login a new user
-            user = authenticate(username=username, password=raw_password)
-            login(request, user)
+            # the form hashes the password once, the saved user is logged
+            # in as is instead of being authenticated, which hashes again
+            new_user = user_form.save()
+            login(request, new_user,
+                  backend=settings.AUTHENTICATION_BACKENDS[0])
             return redirect('home')
     else:
         user_form = CustomUserCreationForm()
@@ -106,24 +273,190 @@ def signup(request):
 
 
 @login_required
+@condition(etag_func=export_user_csv_etag)
 def export_user_csv(request):
-    """Downloads all users as cvs file with a single csv file."""
-    response = HttpResponse(content_type='text/csv')
-    attachmen_name = 'attachment; filename="{date}_user_list.csv"'.format(
-        date=datetime.datetime.now().strftime('%b-%d-%Y'))
+    """Stream all users as a single csv or ndjson file, maybe gzipped.
+
+    Rows are read from the database in chunks and written one at a time,
+    so memory use stays flat whatever the size of the user table.
+    """
+    export_format = get_export_format_param(request)
+    user_list = exports.get_export_rows(get_eligible_param(request))
+    response = StreamingHttpResponse(
+        exports.iter_user_export(user_list, export_format),
+        content_type=exports.EXPORT_FORMATS[export_format])
+    attachmen_name = 'attachment; filename="{name}"'.format(
+        name=exports.get_export_file_name(datetime.datetime.now(),
+                                          export_format))
     response['Content-Disposition'] = attachmen_name
+    return response
+
 
-    user_list = User.objects.filter(is_staff=False,
-                                    is_active=True)
-    writer = csv.writer(response)
-    writer.writerow(['Username', 'Birthday', 'Eligible',
-                     'Random Number', 'BizzFuzz'])
-    for user in user_list:
-        writer.writerow([
-            user.username,
-            user.birth_date,
-            eligible.calculate_age(user.birth_date),
-            user.random_number,
-            bizz_fuzz.get_bizz_fuzz(user.random_number)
-        ])
+@login_required
+@require_POST
+def export_job_create(request):
+    """Queue a background export of the user list."""
+    exports.delete_expired_export_jobs()
+    job = ExportJob.objects.create(
+        user=request.user,
+        eligible=get_eligible_param(request) or '')
+    exports.queue_export_job(job)
+    response = JsonResponse(get_export_job_status(job), status=202)
+    response['Location'] = reverse('export_job_status', args=[job.pk])
     return response
+
+
+def get_export_job_status(job):
+    """Return the status of an export job as a JSON-serializable dict."""
+    status = {'id': job.pk,
+              'status': job.status,
+              'status_url': reverse('export_job_status', args=[job.pk])}
+    if job.status == ExportJob.DONE:
+        status['download_url'] = reverse('export_job_download',
+                                         args=[job.pk])
+    elif job.status == ExportJob.FAILED:
+        status['error'] = job.error
+    return status
+
+
+@login_required
+def export_job_status(request, pk):
+    """Report the status of one of the user's export jobs."""
+    job = get_object_or_404(ExportJob, pk=pk, user=request.user)
+    return JsonResponse(get_export_job_status(job))
+
+
+@login_required
+def export_job_download(request, pk):
+    """Send the file of a finished export job."""
+    job = get_object_or_404(ExportJob, pk=pk, user=request.user,
+                            status=ExportJob.DONE)
+    try:
+        csv_file = open(job.path, 'rb')
+    except FileNotFoundError:
+        raise Http404('The export file has expired.')
+    # FileResponse hands the file to the server's wsgi.file_wrapper
+    return FileResponse(csv_file, as_attachment=True,
+                        filename=exports.get_export_file_name(job.created_at),
+                        content_type='text/csv')
+
+
+# fields served by the JSON API, eligible and bizz_fuzz match the
+# eligible and bizz_fuzz template tags
+API_FIELDS = ('id', 'username', 'birth_date', 'eligible', 'random_number',
+              'bizz_fuzz')
+# usernames accepted by a single batch lookup
+API_BATCH_MAX_SIZE = 500
+
+
+def get_api_fields(request):
+    """Return the API fields requested with ``?fields=``."""
+    fields = [field.strip()
+              for field in request.GET.get('fields', '').split(',')
+              if field.strip()]
+    if not fields:
+        return API_FIELDS
+    unknown = [field for field in fields if field not in API_FIELDS]
+    if unknown:
+        raise ValueError('Unknown fields: {}.'.format(', '.join(unknown)))
+    return tuple(dict.fromkeys(fields))
+
+
+def get_api_rows(user_list, fields, key='id'):
+    """Return (key, dict) pairs holding only the requested fields.
+
+    Rows come straight from ``values()``, no model instance is built. The
+    key column, the pk by default, is fetched even when not requested.
+    """
+    columns = list(fields)
+    for column in (key, 'random_number'):
+        if column not in columns:
+            columns.append(column)
+    rows = []
+    for row in user_list.values(*columns):
+        if 'bizz_fuzz' in fields:
+            row['bizz_fuzz'] = row['bizz_fuzz'] or row['random_number']
+        value = row[key] if key in fields else row.pop(key)
+        if 'random_number' not in fields:
+            del row['random_number']
+        rows.append((value, row))
+    return rows
+
+
+def api_error(message):
+    """Return a JSON error response for a bad API request."""
+    return JsonResponse({'error': message}, status=400)
+
+
+@login_required
+def user_api_list(request):
+    """List active users as JSON, a keyset page at a time."""
+    try:
+        fields = get_api_fields(request)
+    except ValueError as e:
+        return api_error(str(e))
+    after, page_size, eligible, search = get_user_page_params(request)
+    user_list = exports.get_active_users(eligible, search).filter(
+        pk__gt=after).order_by('pk')
+    # fetch one extra row to know whether another page follows
+    rows = get_api_rows(user_list[:page_size + 1], fields)
+    next_url = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        params = request.GET.copy()
+        params['after'] = rows[-1][0]
+        next_url = '{}?{}'.format(request.path, params.urlencode())
+    return JsonResponse({'results': [row for pk, row in rows],
+                         'next': next_url},
+                        json_dumps_params={'separators': (',', ':')})
+
+
+@login_required
+def user_api_batch(request):
+    """Look up many active users by username with a single query."""
+    try:
+        fields = get_api_fields(request)
+    except ValueError as e:
+        return api_error(str(e))
+    usernames = list(dict.fromkeys(
+        username.strip()
+        for username in request.GET.get('usernames', '').split(',')
+        if username.strip()))
+    if len(usernames) > API_BATCH_MAX_SIZE:
+        return api_error('At most {} usernames can be looked up at once.'
+                         .format(API_BATCH_MAX_SIZE))
+    user_list = User.objects.filter(
+        username__in=usernames, is_active=True).with_eligibility()
+    rows = dict(get_api_rows(user_list, fields, key='username'))
+    return JsonResponse(
+        {'results': [rows[username] for username in usernames
+                     if username in rows],
+         'missing': [username for username in usernames
+                     if username not in rows]},
+        json_dumps_params={'separators': (',', ':')})
+
+
+@staff_member_required
+def metrics_view(request):
+    """Expose the per-view request metrics in Prometheus text format."""
+    return HttpResponse(metrics.render_prometheus(metrics.registry.collect()),
+                        content_type='text/plain; version=0.0.4')
+
+
+# usernames returned by a single autocomplete request at most
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+
+@login_required
+def user_autocomplete(request):
+    """Suggest usernames whose words start with the words of ``?q=``."""
+    limit = min(get_int_param(request, 'limit', 10) or 10,
+                AUTOCOMPLETE_MAX_LIMIT)
+    search = get_search_param(request)
+    usernames = []
+    if search:
+        usernames = list(User.objects.filter(is_active=True).search(
+            search).order_by('username').values_list(
+                'username', flat=True)[:limit])
+    return JsonResponse({'results': usernames},
+                        json_dumps_params={'separators': (',', ':')})
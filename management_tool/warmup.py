@@ -0,0 +1,106 @@
+import os
+import time
+
+from django.apps import apps
+from django.contrib.auth.forms import AuthenticationForm, PasswordResetForm
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db import connections
+from django.template import engines
+from django.urls import NoReverseMatch, get_resolver, reverse
+
+from users.forms import CustomUserChangeForm, CustomUserCreationForm
+
+# forms shown by the app's pages
+FORMS = (AuthenticationForm, CustomUserChangeForm, CustomUserCreationForm,
+         PasswordResetForm)
+
+
+def get_template_names():
+    """Return the names of every template of the management_tool app."""
+    root = os.path.join(apps.get_app_config('management_tool').path,
+                        'templates')
+    names = []
+    for directory, _, files in os.walk(root):
+        for file_name in files:
+            if file_name.endswith('.html'):
+                path = os.path.join(directory, file_name)
+                names.append(os.path.relpath(path, root).replace(os.sep, '/'))
+    return sorted(names)
+
+
+def compile_templates():
+    """Compile the app's templates into the cached template loader.
+
+    Without a cached loader the templates are compiled again anyway, so
+    this only pays off with the production settings.
+    """
+    engine = engines['django']
+    names = get_template_names()
+    for name in names:
+        engine.get_template(name)
+    return len(names)
+
+
+def render_forms():
+    """Render the app's forms, which compiles their widget templates.
+
+    Widgets are rendered by the form renderer's own template engine, not
+    by the one compile_templates fills.
+    """
+    for form_class in FORMS:
+        str(form_class())
+    return len(FORMS)
+
+
+def resolve_urls():
+    """Build the URL resolver's lookup tables and reverse every URL name.
+
+    Names that take arguments are only looked up, since there is no value
+    to give them.
+    """
+    resolver = get_resolver()
+    names = [name for name in resolver.reverse_dict if isinstance(name, str)]
+    for name in names:
+        try:
+            reverse(name)
+        except NoReverseMatch:
+            pass
+    return len(names)
+
+
+def connect_databases():
+    """Open the connection to every database and run a first query."""
+    for alias in connections:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+    return len(connections.databases)
+
+
+def load_static_manifest():
+    """Read the hashed static file names collectstatic wrote, if any."""
+    return len(getattr(staticfiles_storage, 'hashed_files', ()))
+
+
+WARM_UP_STEPS = (
+    ('templates', compile_templates),
+    ('forms', render_forms),
+    ('urls', resolve_urls),
+    ('databases', connect_databases),
+    ('static_manifest', load_static_manifest),
+)
+
+
+def warm_up():
+    """Pay the first request costs of a worker before it takes traffic.
+
+    Call it from the worker process itself, database connections opened
+    before a fork must not be shared by the children. Return the number of
+    objects each step loaded and the seconds it took.
+    """
+    report = {}
+    for name, step in WARM_UP_STEPS:
+        start = time.perf_counter()
+        count = step()
+        report[name] = {'count': count,
+                        'seconds': time.perf_counter() - start}
+    return report
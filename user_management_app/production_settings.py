@@ -0,0 +1,66 @@
+"""
+Production settings for user_management_app project.
+
+Select them with DJANGO_SETTINGS_MODULE=user_management_app.production_settings
+and run collectstatic before starting the workers. Everything not set here
+comes from settings.py.
+"""
+
+import copy
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, STATIC_ROOT, TEMPLATES
+
+DEBUG = False
+
+try:
+    SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+except KeyError:
+    raise ImproperlyConfigured('Set the DJANGO_SECRET_KEY environment '
+                               'variable.')
+
+# comma separated host names, such as "example.com,www.example.com"
+ALLOWED_HOSTS = [host for host in
+                 os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',')
+                 if host]
+
+# Connections are kept open across requests instead of being opened for
+# each one.
+DATABASES = copy.deepcopy(DATABASES)
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = int(
+        os.environ.get('DATABASE_CONN_MAX_AGE', 60))
+
+# Run on every new SQLite connection. WAL lets readers go on while a
+# write is in progress and busy_timeout makes writers wait for each other
+# instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    # negative sizes are in KiB
+    'cache_size': -20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory',
+}
+
+# Templates are compiled once per worker and kept, instead of being read and
+# compiled on every render. A template changed on disk needs a restart.
+TEMPLATES = copy.deepcopy(TEMPLATES)
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['debug'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+WSGI_WARM_UP = os.environ.get('WSGI_WARM_UP', '1') == '1'
+
+STATIC_ROOT = os.environ.get('DJANGO_STATIC_ROOT', STATIC_ROOT)
+STATICFILES_STORAGE = ('management_tool.storage.'
+                       'CompressedManifestStaticFilesStorage')
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -40,11 +42,12 @@ INSTALLED_APPS = [
     # apps
     'users.apps.UsersConfig',
     'management_tool.apps.ManagementToolConfig',
-    # 3rd party
-    "bootstrap_datepicker_plus",
 ]
 
 MIDDLEWARE = [
+    'management_tool.middleware.MetricsMiddleware',
+    'management_tool.middleware.CompressionMiddleware',
+    'management_tool.routers.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,7 +62,7 @@ ROOT_URLCONF = 'user_management_app.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': ['management_tool/templates'],
+        'DIRS': [os.path.join(BASE_DIR, 'management_tool', 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -73,6 +76,9 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'user_management_app.wsgi.application'
+# compile the templates and connect to the databases when a worker loads
+# wsgi.py, instead of on its first requests
+WSGI_WARM_UP = False
 
 
 # Database
@@ -81,10 +87,97 @@ WSGI_APPLICATION = 'user_management_app.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'NAME': os.environ.get('DATABASE_NAME',
+                               os.path.join(BASE_DIR, 'db.sqlite3')),
+        # seconds a connection is kept open across requests, 0 closes it
+        # at the end of each one
+        'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 0)),
     }
 }
 
+# Aliases reads are sent to by management_tool.routers, writes always go to
+# 'default'. For a local setup with two SQLite files, point
+# DATABASE_REPLICA_NAME at the second file and copy the primary into it
+# with the sync_replicas command.
+DATABASE_REPLICAS = []
+if os.environ.get('DATABASE_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['DATABASE_REPLICA_NAME'],
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    }
+    DATABASE_REPLICAS.append('replica')
+
+DATABASE_ROUTERS = ['management_tool.routers.PrimaryReplicaRouter']
+# seconds a client keeps reading from the primary after it wrote
+REPLICA_PIN_SECONDS = 5
+
+# PRAGMA values run on every new SQLite connection, see
+# production_settings.py. Empty keeps the SQLite defaults.
+SQLITE_PRAGMAS = {}
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # pre-rendered user list rows, least recently used ones are evicted
+    'user_rows': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'user_rows',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+    # token buckets of management_tool.throttling, a cache shared by the
+    # workers, such as memcached or redis, makes the limits global
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'throttle',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+    # sessions of the cache and cached_db session engines, e.g.
+    # SESSION_CACHE_BACKEND=django.core.cache.backends.memcached.
+    # MemcachedCache and SESSION_CACHE_LOCATION=127.0.0.1:11211
+    'sessions': {
+        'BACKEND': os.environ.get(
+            'SESSION_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('SESSION_CACHE_LOCATION', 'sessions'),
+    },
+}
+# memcached hands OPTIONS to its client library, which has no MAX_ENTRIES
+if CACHES['sessions']['BACKEND'].endswith('.LocMemCache'):
+    CACHES['sessions']['OPTIONS'] = {'MAX_ENTRIES': 100000}
+
+
+# Sessions
+# https://docs.djangoproject.com/en/2.2/topics/http/sessions/
+
+# 'db', 'cached_db' or 'cache'. Both cache modes read the session from the
+# 'sessions' cache first, so that cache must be shared by every worker: with
+# a per-process local memory cache, a logout only deletes the session from
+# the worker that handled it and the others keep accepting the cookie.
+SESSION_MODE = os.environ.get('SESSION_MODE', 'db')
+if (SESSION_MODE != 'db' and
+        CACHES['sessions']['BACKEND'].endswith('.LocMemCache')):
+    raise ImproperlyConfigured(
+        "SESSION_MODE '{}' needs a cache shared by the workers, set "
+        "SESSION_CACHE_BACKEND and SESSION_CACHE_LOCATION.".format(
+            SESSION_MODE))
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + SESSION_MODE
+SESSION_CACHE_ALIAS = 'sessions'
+# expired sessions deleted per transaction by purge_sessions
+SESSION_PURGE_BATCH_SIZE = 1000
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -104,6 +197,22 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# PASSWORD_HASHER hashes new passwords, the others verify older hashes.
+# ConfigurablePBKDF2PasswordHasher verifies pbkdf2_sha256 hashes, listing
+# Django's PBKDF2PasswordHasher as well would take that over.
+PASSWORD_HASHER = os.environ.get(
+    'PASSWORD_HASHER', 'users.hashers.ConfigurablePBKDF2PasswordHasher')
+PASSWORD_HASHERS = [PASSWORD_HASHER] + [hasher for hasher in (
+    'users.hashers.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+) if hasher != PASSWORD_HASHER]
+# PBKDF2 rounds of users.hashers.ConfigurablePBKDF2PasswordHasher, fewer
+# rounds trade brute force resistance for signup and login throughput
+PASSWORD_PBKDF2_ITERATIONS = int(
+    os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 150000))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/2.2/topics/i18n/
@@ -123,6 +232,20 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 
 STATIC_URL = '/static/'
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# collectstatic copies files under content hashed names and writes .gz and
+# .br variants next to them, which user_management_app.static serves with
+# far-future cache headers. Hashed names only exist after a collectstatic
+# run, so development keeps the plain names.
+if DEBUG:
+    STATICFILES_STORAGE = ('django.contrib.staticfiles.storage.'
+                           'StaticFilesStorage')
+else:
+    STATICFILES_STORAGE = ('management_tool.storage.'
+                           'CompressedManifestStaticFilesStorage')
+# seconds a static file without a hashed name may be cached
+STATIC_MAX_AGE = 60 * 60
 
 # Custom user model
 AUTH_USER_MODEL = 'users.CustomUser'
@@ -133,3 +256,54 @@ LOGIN_URL = 'login'
 LOGOUT_URL = 'logout'
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# user_delete only deactivates users, purge_deleted_users deletes them
+USER_SOFT_DELETE = True
+# soft deleted users removed per transaction by purge_deleted_users
+USER_PURGE_BATCH_SIZE = 500
+
+# User list pagination
+USER_LIST_PAGE_SIZE = 50
+USER_LIST_MAX_PAGE_SIZE = 500
+
+# Background user list exports
+EXPORT_ROOT = os.path.join(BASE_DIR, 'exports')
+EXPORT_JOB_WORKERS = 2
+# seconds an export job and its file are kept
+EXPORT_JOB_RETENTION = 24 * 60 * 60
+# seconds after which a running export job is taken for dead, then
+# run_export_jobs retries it and the cleanup may delete it
+EXPORT_JOB_TIMEOUT = 60 * 60
+
+# Throttling of the views that hash passwords or send mail. Each scope has
+# a bucket per client IP and one per submitted username or email, given as
+# (requests, seconds): bursts of up to that many requests are let through,
+# then requests are refilled at that rate.
+THROTTLE_ENABLED = True
+THROTTLE_RATES = {
+    'login': {'ip': (30, 60), 'identity': (10, 60)},
+    'signup': {'ip': (10, 60), 'identity': (5, 60)},
+    'password_reset': {'ip': (10, 60), 'identity': (3, 60)},
+}
+
+# Response compression by management_tool.middleware.CompressionMiddleware,
+# which sits below MetricsMiddleware so the metrics record the bytes sent
+COMPRESSION_CONTENT_TYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'text/csv',
+    'text/html',
+    'text/plain',
+}
+# bytes under which a response is not worth compressing
+COMPRESSION_MIN_SIZE = 1024
+
+# Request metrics, merged across worker processes through a SQLite file.
+# Set METRICS_DB to an empty string to keep each process' metrics in
+# memory, as the tests do through TEST_RUNNER.
+METRICS_DB = os.environ.get('METRICS_DB',
+                            os.path.join(BASE_DIR, 'metrics.sqlite3')) or None
+# seconds between two merges of a process' metrics into METRICS_DB
+METRICS_FLUSH_INTERVAL = 5
+
+TEST_RUNNER = 'management_tool.testing.TestRunner'
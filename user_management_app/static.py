@@ -0,0 +1,118 @@
+"""
+WSGI handler that serves the collected static files.
+
+Files are looked up in STATIC_ROOT. When the client accepts it, the .br or
+.gz variant written by collectstatic is sent instead of the file itself.
+Files listed in the staticfiles.json manifest have content hashed names and
+are cached for a year, the others for STATIC_MAX_AGE seconds. Requests for
+anything else are passed on to the wrapped application.
+"""
+
+import json
+import mimetypes
+import os
+import posixpath
+from email.utils import formatdate, parsedate_to_datetime
+from wsgiref.headers import Headers
+
+from django.conf import settings
+from django.utils.encoding import iri_to_uri
+
+from management_tool.compression import SUFFIXES, accepted_encodings
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+MANIFEST_NAME = 'staticfiles.json'
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def read_manifest(root):
+    """Return the hashed names listed in the manifest of a static root."""
+    try:
+        with open(os.path.join(root, MANIFEST_NAME)) as manifest:
+            paths = json.load(manifest).get('paths', {})
+    except (OSError, ValueError):
+        return set()
+    return set(paths.values())
+
+
+def read_chunks(static_file):
+    with static_file:
+        for chunk in iter(lambda: static_file.read(FILE_CHUNK_SIZE), b''):
+            yield chunk
+
+
+class StaticFilesHandler:
+    """Serve STATIC_URL from STATIC_ROOT in front of a WSGI application."""
+
+    def __init__(self, application, root=None, prefix=None, max_age=None):
+        self.application = application
+        self.root = os.path.abspath(root or settings.STATIC_ROOT)
+        self.prefix = iri_to_uri(prefix or settings.STATIC_URL)
+        if max_age is None:
+            max_age = settings.STATIC_MAX_AGE
+        self.max_age = max_age
+        self.hashed_names = read_manifest(self.root)
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        method = environ.get('REQUEST_METHOD', 'GET')
+        if method in ('GET', 'HEAD') and path.startswith(self.prefix):
+            name = self.get_name(path[len(self.prefix):])
+            if name is not None:
+                return self.serve(name, environ, start_response)
+        return self.application(environ, start_response)
+
+    def get_name(self, path):
+        """Return the static file a URL path names, if it exists."""
+        name = posixpath.normpath(path).lstrip('/')
+        if name.startswith('..') or '\x00' in name:
+            return None
+        if not os.path.isfile(os.path.join(self.root, name)):
+            return None
+        return name
+
+    def serve(self, name, environ, start_response):
+        path = os.path.join(self.root, name)
+        headers = Headers([])
+        accepted = accepted_encodings(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        for encoding, suffix in SUFFIXES.items():
+            if encoding in accepted and os.path.isfile(path + suffix):
+                path += suffix
+                headers['Content-Encoding'] = encoding
+                break
+        stat = os.stat(path)
+        content_type, _ = mimetypes.guess_type(name)
+        if content_type and content_type.startswith('text/'):
+            content_type += '; charset=utf-8'
+        headers['Content-Type'] = content_type or 'application/octet-stream'
+        headers['Vary'] = 'Accept-Encoding'
+        headers['Last-Modified'] = formatdate(stat.st_mtime, usegmt=True)
+        if name in self.hashed_names:
+            headers['Cache-Control'] = 'public, max-age=%d, immutable' % (
+                IMMUTABLE_MAX_AGE)
+        else:
+            headers['Cache-Control'] = 'public, max-age=%d' % self.max_age
+        if not self.is_modified(environ, stat.st_mtime):
+            del headers['Content-Type']
+            start_response('304 Not Modified', headers.items())
+            return []
+        headers['Content-Length'] = str(stat.st_size)
+        start_response('200 OK', headers.items())
+        if environ.get('REQUEST_METHOD') == 'HEAD':
+            return []
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        static_file = open(path, 'rb')
+        if file_wrapper is not None:
+            return file_wrapper(static_file, FILE_CHUNK_SIZE)
+        return read_chunks(static_file)
+
+    @staticmethod
+    def is_modified(environ, mtime):
+        header = environ.get('HTTP_IF_MODIFIED_SINCE')
+        if not header:
+            return True
+        try:
+            since = parsedate_to_datetime(header).timestamp()
+        except (TypeError, ValueError):
+            return True
+        return int(mtime) > since
@@ -9,8 +9,24 @@ https://docs.djangoproject.com/en/2.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
+from user_management_app.static import StaticFilesHandler
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'user_management_app.settings')
 
 application = get_wsgi_application()
+
+# each worker imports this module before it accepts connections, unless the
+# application is preloaded before forking, which would share the database
+# connections between workers. The app's modules can only be imported once
+# the application is set up.
+if settings.WSGI_WARM_UP:
+    from management_tool.warmup import warm_up
+    warm_up()
+
+# development serves static files with runserver, production from the
+# collected and precompressed files
+if not settings.DEBUG:
+    application = StaticFilesHandler(application)
@@ -1,10 +1,52 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
+from django.core.paginator import Paginator
+from django.db.models import Max
+from django.utils.functional import cached_property
 
-from .models import CustomUser
+from .models import CustomUser, RandomNumber
 from .forms import CustomUserCreationForm, CustomUserChangeForm
 
 
+class EstimatedCountPaginator(Paginator):
+    """Paginator that estimates the size of an unfiltered user table.
+
+    The highest primary key is read from the index instead of counting
+    every row. Deleted users make it an overestimate, so the last pages
+    may come out short or empty.
+    """
+
+    @cached_property
+    def count(self):
+        if self.object_list.query.where:
+            return super().count
+        return self.object_list.order_by().aggregate(
+            max_pk=Max('pk'))['max_pk'] or 0
+
+
+def deactivate_users(modeladmin, request, queryset):
+    """Deactivate the selected users with a single UPDATE."""
+    # the admin running the action keeps its own account
+    rows = queryset.exclude(pk=request.user.pk).update(is_active=False)
+    modeladmin.message_user(request, 'Deactivated {} users.'.format(rows),
+                            messages.SUCCESS)
+
+
+deactivate_users.short_description = 'Deactivate selected users'
+
+
+def regenerate_random_numbers(modeladmin, request, queryset):
+    """Draw a new random number for each selected user in SQL."""
+    rows = queryset.update(random_number=RandomNumber())
+    modeladmin.message_user(
+        request, 'Regenerated the random number of {} users.'.format(rows),
+        messages.SUCCESS)
+
+
+regenerate_random_numbers.short_description = (
+    'Regenerate random number of selected users')
+
+
 class CustomUserAdmin(UserAdmin):
     add_form = CustomUserCreationForm
     add_fieldsets = UserAdmin.add_fieldsets + (
@@ -18,7 +60,17 @@ class CustomUserAdmin(UserAdmin):
                 {'fields': ('birth_date', 'random_number')}),
     )
 
-    list_display = ['username', 'email', 'birth_date', 'random_number']
+    # large tables: only indexed columns are shown and sorted on, and
+    # pages neither run an exact COUNT(*) of the table nor an unindexed
+    # ORDER BY
+    list_display = ['username', 'email', 'birth_date', 'bizz_fuzz',
+                    'updated_at']
+    sortable_by = list_display
+    ordering = ('-pk',)
+    list_filter = UserAdmin.list_filter + ('bizz_fuzz',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    actions = [deactivate_users, regenerate_random_numbers]
 
 
 admin.site.register(CustomUser, CustomUserAdmin)
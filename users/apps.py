@@ -1,5 +1,10 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class UsersConfig(AppConfig):
     name = 'users'
+
+    def ready(self):
+        from .signals import restore_search_index_after_migrate
+        post_migrate.connect(restore_search_index_after_migrate, sender=self)
@@ -1,16 +1,26 @@
+from django import forms
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm
-from bootstrap_datepicker_plus import DatePickerInput
 
 from .models import CustomUser
 
 
+class DateInput(forms.DateInput):
+    """The browser's own date picker, it needs no script or stylesheet."""
+
+    input_type = 'date'
+
+    def __init__(self, attrs=None):
+        # the value of a date input is always yyyy-mm-dd
+        super().__init__(attrs, format='%Y-%m-%d')
+
+
 class CustomUserCreationForm(UserCreationForm):
 
     class Meta:
         model = CustomUser
         fields = ('username', 'email', 'birth_date')
         widgets = {
-             'birth_date': DatePickerInput()
+             'birth_date': DateInput()
          }
 
 
@@ -21,5 +31,5 @@ class CustomUserChangeForm(UserChangeForm):
         model = CustomUser
         fields = ('username', 'birth_date', 'random_number')
         widgets = {
-             'birth_date': DatePickerInput()
+             'birth_date': DateInput()
          }
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 with the iteration count of PASSWORD_PBKDF2_ITERATIONS.
+
+    It shares the pbkdf2_sha256 algorithm name, so existing hashes keep
+    working and are rehashed on login when the iteration count changes.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
@@ -0,0 +1,92 @@
+import datetime
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from management_tool.testing import bench_environment
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Seed a large user table and print the query plan and timings '
+            'of the hot view queries with and without the custom indexes, '
+            'in a throwaway test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000,
+                            help='Number of users to seed.')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Number of timed runs per query.')
+
+    def handle(self, *args, **options):
+        with bench_environment():
+            self.run_bench(options['users'], options['repeat'])
+
+    def run_bench(self, users, repeat):
+        self.seed(users)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        # the SQLite schema editor refuses to run inside a transaction,
+        # which a test may hold, so only use it to build the statements
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for index in User._meta.indexes:
+                cursor.execute(str(index.remove_sql(User, editor)))
+        self.report('before', repeat)
+        with connection.cursor() as cursor:
+            for index in User._meta.indexes:
+                cursor.execute(str(index.create_sql(User, editor)))
+            cursor.execute('ANALYZE')
+        self.report('after', repeat)
+
+    def seed(self, count):
+        """Insert count users with a mix of staff and inactive accounts."""
+        start = time.perf_counter()
+        today = datetime.date.today()
+        User.objects.bulk_create(
+            (User(username='bench_user_{}'.format(i),
+                  email='bench_user_{}@example.com'.format(i),
+                  password='!',
+                  is_staff=random.random() < 0.01,
+                  is_active=random.random() > 0.05,
+                  birth_date=today - datetime.timedelta(
+                      days=random.randint(365, 365 * 90)),
+                  random_number=random.randint(1, 100))
+             for i in range(count)))
+        self.stdout.write('Seeded {} users in {:.2f}s'.format(
+            count, time.perf_counter() - start))
+
+    def get_queries(self):
+        """Return the queries issued by the hot views."""
+        active = User.objects.filter(is_staff=False, is_active=True)
+        username = 'bench_user_{}'.format(User.objects.count() // 2)
+        return [
+            ('user_list',
+             active.filter(pk__gt=0).order_by('pk')[:51]),
+            ('export_user_csv',
+             active.values_list('username', 'birth_date', 'random_number')),
+            ('user_details',
+             User.objects.filter(username=username, is_active=True)),
+        ]
+
+    def report(self, label, repeat):
+        """Print the query plan and timings of every hot query."""
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            'Custom indexes: {}'.format(label)))
+        for name, queryset in self.get_queries():
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append(time.perf_counter() - start)
+            self.stdout.write('  {}: median {:.2f}ms, best {:.2f}ms'.format(
+                name,
+                statistics.median(timings) * 1000,
+                min(timings) * 1000))
+            for line in queryset.explain().splitlines():
+                self.stdout.write('    ' + line)
@@ -0,0 +1,142 @@
+import csv
+import datetime
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+User = get_user_model()
+
+# birthdays are written as dd/mm/yyyy by spreadsheets and as yyyy-mm-dd
+# by export_user_csv
+DATE_FORMATS = ('%d/%m/%Y', '%Y-%m-%d')
+
+
+def parse_birth_date(value):
+    """Parse a birthday in any of the supported formats."""
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, date_format).date()
+        except ValueError:
+            pass
+    raise ValidationError('Invalid birthday {!r}.'.format(value))
+
+
+class Command(BaseCommand):
+    help = ('Import users from a CSV file in the export_user_csv format '
+            '(Username, Birthday, Eligible, Random Number, BizzFuzz).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to import.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of users inserted per transaction.')
+        parser.add_argument('--email-domain', default='users.invalid',
+                            help='Domain of the generated user emails.')
+        parser.add_argument('--password',
+                            help='Password hashed for every imported user. '
+                                 'Users get an unusable password if unset.')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Number of processes hashing passwords.')
+
+    def handle(self, *args, **options):
+        self.email_domain = options['email_domain']
+        self.password = options['password']
+        self.batch_size = options['batch_size']
+        if self.batch_size < 1:
+            raise CommandError('--batch-size must be a positive number.')
+        self.imported = 0
+        self.rejected = 0
+        self.seen = set()
+
+        start = time.perf_counter()
+        executor = (ProcessPoolExecutor(options['workers'])
+                    if self.password else None)
+        try:
+            with open(options['path'], newline='') as csv_file:
+                reader = csv.DictReader(csv_file)
+                batch = []
+                for user in self.read_users(reader):
+                    batch.append(user)
+                    if len(batch) >= self.batch_size:
+                        self.save_batch(batch, executor)
+                        batch = []
+                if batch:
+                    self.save_batch(batch, executor)
+        except OSError as e:
+            raise CommandError(e)
+        finally:
+            if executor:
+                executor.shutdown()
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            'Imported {} users in {:.2f}s ({:.0f} rows/s), '
+            'rejected {} rows.'.format(
+                self.imported, elapsed,
+                self.imported / elapsed if elapsed else 0,
+                self.rejected)))
+
+    def reject(self, line, reason):
+        """Report a row that is not imported."""
+        self.rejected += 1
+        self.stderr.write('Line {}: {}'.format(line, reason))
+
+    def read_users(self, reader):
+        """Yield an unsaved user for every valid row of the reader."""
+        username_field = User._meta.get_field('username')
+        for row in reader:
+            try:
+                username = username_field.clean(
+                    (row.get('Username') or '').strip(), None)
+                birth_date = parse_birth_date(
+                    (row.get('Birthday') or '').strip())
+                random_number = int(row.get('Random Number') or '')
+            except ValidationError as e:
+                self.reject(reader.line_num, ' '.join(e.messages))
+                continue
+            except ValueError:
+                self.reject(reader.line_num, 'Invalid random number {!r}.'
+                            .format(row.get('Random Number')))
+                continue
+            if username in self.seen:
+                self.reject(reader.line_num,
+                            'Duplicate username {!r}.'.format(username))
+                continue
+            self.seen.add(username)
+            user = User(username=username,
+                        email='{}@{}'.format(username, self.email_domain),
+                        birth_date=birth_date,
+                        random_number=random_number)
+            user.line_num = reader.line_num
+            yield user
+
+    def save_batch(self, batch, executor):
+        """Insert a batch of users that do not exist yet in one transaction."""
+        existing = set(User.objects.filter(
+            username__in=[user.username for user in batch]).values_list(
+                'username', flat=True))
+        existing_emails = set(User.objects.filter(
+            email__in=[user.email for user in batch]).values_list(
+                'email', flat=True))
+        users = []
+        for user in batch:
+            if user.username in existing or user.email in existing_emails:
+                self.reject(user.line_num, 'User {!r} already exists.'
+                            .format(user.username))
+            else:
+                users.append(user)
+        if executor:
+            passwords = executor.map(make_password,
+                                     [self.password] * len(users),
+                                     chunksize=max(len(users) // 32, 1))
+        else:
+            passwords = (make_password(None) for _ in users)
+        for user, password in zip(users, passwords):
+            user.password = password
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+        self.imported += len(users)
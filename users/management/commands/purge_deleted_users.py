@@ -0,0 +1,51 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Delete the users soft deleted by user_delete in small '
+            'batches, each in its own short transaction.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.USER_PURGE_BATCH_SIZE,
+                            help='Number of users deleted per transaction.')
+        parser.add_argument('--older-than', type=int, default=0,
+                            help='Only purge users deleted at least this '
+                                 'many seconds ago.')
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Seconds to wait between two batches.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be a positive number.')
+        cutoff = timezone.now() - datetime.timedelta(
+            seconds=options['older_than'])
+        deleted = User._base_manager.filter(is_active=False,
+                                            deleted_at__lte=cutoff)
+        purged = 0
+        while True:
+            with transaction.atomic():
+                pks = list(deleted.order_by('pk').values_list(
+                    'pk', flat=True)[:batch_size])
+                if not pks:
+                    break
+                # cascades to groups, permissions, admin log entries and
+                # export jobs of the batch only
+                deleted.filter(pk__in=pks).delete()
+            purged += len(pks)
+            if len(pks) < batch_size:
+                break
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(
+            'Purged {} deleted users.'.format(purged)))
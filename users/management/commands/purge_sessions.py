@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = ('Delete expired database sessions in small batches, each in '
+            'its own transaction, so the database is never locked for long.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.SESSION_PURGE_BATCH_SIZE,
+                            help='Number of sessions deleted per transaction.')
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Seconds to wait between two batches.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be a positive number.')
+        # sessions expiring while the purge runs are left for the next one
+        now = timezone.now()
+        expired = Session.objects.filter(expire_date__lt=now)
+        deleted = 0
+        while True:
+            keys = list(expired.values_list('session_key', flat=True)
+                        [:batch_size])
+            if not keys:
+                break
+            # a session renewed since it was selected is kept
+            count, _ = expired.filter(session_key__in=keys).delete()
+            deleted += count
+            if len(keys) < batch_size:
+                break
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(
+            'Deleted {} expired sessions.'.format(deleted)))
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.11 on 2026-10-18 07:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['is_active', 'is_staff', 'id'], name='users_active_staff_id_idx'),
+        ),
+    ]
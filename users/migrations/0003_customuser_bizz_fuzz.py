@@ -0,0 +1,25 @@
+# Generated by Django 2.2.11 on 2026-10-18 07:31
+
+from django.db import migrations, models
+import users.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_customuser_active_staff_index'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='customuser',
+            managers=[
+                ('objects', users.models.CustomUserManager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='bizz_fuzz',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=8),
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+from users.models import BizzFuzzCategory
+
+
+def backfill_bizz_fuzz(apps, schema_editor):
+    CustomUser = apps.get_model('users', 'CustomUser')
+    CustomUser._base_manager.using(schema_editor.connection.alias).update(
+        bizz_fuzz=BizzFuzzCategory('random_number'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_customuser_bizz_fuzz'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_bizz_fuzz, migrations.RunPython.noop),
+    ]
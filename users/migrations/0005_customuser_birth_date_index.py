@@ -0,0 +1,18 @@
+# Generated by Django 2.2.11 on 2026-10-18 07:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_backfill_bizz_fuzz'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='birth_date',
+            field=models.DateField(db_index=True, null=True),
+        ),
+    ]
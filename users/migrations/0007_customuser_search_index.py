@@ -0,0 +1,78 @@
+from django.db import migrations
+
+# full-text index over the searchable user columns, kept in sync by
+# triggers so that bulk updates and raw SQL are covered as well
+CREATE_SEARCH_INDEX = [
+    """
+    CREATE VIRTUAL TABLE users_customuser_fts USING fts5(
+        username, email, first_name, last_name,
+        content='users_customuser', content_rowid='id',
+        prefix='2 3 4'
+    )
+    """,
+    """
+    CREATE TRIGGER users_customuser_fts_insert
+    AFTER INSERT ON users_customuser BEGIN
+        INSERT INTO users_customuser_fts
+            (rowid, username, email, first_name, last_name)
+        VALUES (new.id, new.username, new.email, new.first_name,
+                new.last_name);
+    END
+    """,
+    """
+    CREATE TRIGGER users_customuser_fts_delete
+    AFTER DELETE ON users_customuser BEGIN
+        INSERT INTO users_customuser_fts
+            (users_customuser_fts, rowid, username, email, first_name,
+             last_name)
+        VALUES ('delete', old.id, old.username, old.email, old.first_name,
+                old.last_name);
+    END
+    """,
+    """
+    CREATE TRIGGER users_customuser_fts_update
+    AFTER UPDATE OF username, email, first_name, last_name
+    ON users_customuser BEGIN
+        INSERT INTO users_customuser_fts
+            (users_customuser_fts, rowid, username, email, first_name,
+             last_name)
+        VALUES ('delete', old.id, old.username, old.email, old.first_name,
+                old.last_name);
+        INSERT INTO users_customuser_fts
+            (rowid, username, email, first_name, last_name)
+        VALUES (new.id, new.username, new.email, new.first_name,
+                new.last_name);
+    END
+    """,
+    "INSERT INTO users_customuser_fts (users_customuser_fts) "
+    "VALUES ('rebuild')",
+]
+
+DROP_SEARCH_INDEX = [
+    'DROP TRIGGER IF EXISTS users_customuser_fts_update',
+    'DROP TRIGGER IF EXISTS users_customuser_fts_delete',
+    'DROP TRIGGER IF EXISTS users_customuser_fts_insert',
+    'DROP TABLE IF EXISTS users_customuser_fts',
+]
+
+
+def run_on_sqlite(statements):
+    def run(apps, schema_editor):
+        # other databases fall back to a plain search in the queryset
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_customuser_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_sqlite(CREATE_SEARCH_INDEX),
+                             run_on_sqlite(DROP_SEARCH_INDEX)),
+    ]
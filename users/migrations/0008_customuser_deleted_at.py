@@ -0,0 +1,30 @@
+# Generated by Django 2.2.11 on 2026-10-18 08:15
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+search_index = import_module('users.migrations.0007_customuser_search_index')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_customuser_search_index'),
+    ]
+
+    # SQLite adds the column by rebuilding the table, which drops the
+    # search index triggers, so the index is rebuilt around it
+    operations = [
+        migrations.RunPython(
+            search_index.run_on_sqlite(search_index.DROP_SEARCH_INDEX),
+            search_index.run_on_sqlite(search_index.CREATE_SEARCH_INDEX)),
+        migrations.AddField(
+            model_name='customuser',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(
+            search_index.run_on_sqlite(search_index.CREATE_SEARCH_INDEX),
+            search_index.run_on_sqlite(search_index.DROP_SEARCH_INDEX)),
+    ]
@@ -1,20 +1,207 @@
+import datetime
 import random
+import re
 
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.utils import timezone
 from django.urls import reverse
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 
 
 def generate_random_number():
     return random.randint(1, 100)
 
 
+def get_bizz_fuzz_category(random_number):
+    """Return the BizzFuzz category of a random number or an empty string."""
+    if random_number % 15 == 0:
+        return 'BizzFuzz'
+    elif random_number % 3 == 0:
+        return 'Bizz'
+    elif random_number % 5 == 0:
+        return 'Fuzz'
+    return ''
+
+
+def get_eligibility_cutoff(today=None, age=13):
+    """Return the latest birth date of a user older than the given age.
+
+    It matches the calculate_age template filter, a user is Allowed when
+    born on or before the cutoff and Blocked when born after it.
+    """
+    today = today or datetime.date.today()
+    year = today.year - age - 1
+    try:
+        return today.replace(year=year)
+    except ValueError:
+        # born on 29 February, the birthday is not reached on 28 February
+        return today.replace(year=year, day=28)
+
+
+class BizzFuzzCategory(models.Func):
+    """Compute the BizzFuzz category of an integer expression in SQL."""
+
+    arity = 1
+    template = ("CASE WHEN %(expressions)s %%%% 15 = 0 THEN 'BizzFuzz' "
+                "WHEN %(expressions)s %%%% 3 = 0 THEN 'Bizz' "
+                "WHEN %(expressions)s %%%% 5 = 0 THEN 'Fuzz' "
+                "ELSE '' END")
+    output_field = models.CharField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sql, params = super().as_sql(compiler, connection, **extra_context)
+        # the expression is repeated in each branch of the CASE
+        return sql, params * 3
+
+
+class RandomNumber(models.Func):
+    """Draw a random number like generate_random_number, for every row."""
+
+    # RANDOM() is a signed 64-bit integer, clearing its sign bit leaves a
+    # non-negative one, whose remainders are plainly uniform
+    template = '((RANDOM() & 9223372036854775807) %%%% 100) + 1'
+    output_field = models.IntegerField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection,
+                           template='FLOOR(RANDOM() * 100)::integer + 1',
+                           **extra_context)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection,
+                           template='FLOOR(RAND() * 100) + 1',
+                           **extra_context)
+
+
+def get_search_match(query):
+    """Turn a user search into an FTS5 query matching word prefixes."""
+    words = re.findall(r'\w+', query)
+    return ' AND '.join('"{}"*'.format(word) for word in words)
+
+
+class CustomUserQuerySet(models.QuerySet):
+    """Keep the stored BizzFuzz category in sync on bulk operations."""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.bizz_fuzz = get_bizz_fuzz_category(obj.random_number)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def update(self, **kwargs):
+        kwargs.setdefault('updated_at', timezone.now())
+        return self._update_with_bizz_fuzz(**kwargs)
+
+    def _update_with_bizz_fuzz(self, **kwargs):
+        if 'random_number' not in kwargs or 'bizz_fuzz' in kwargs:
+            return super().update(**kwargs)
+        random_number = kwargs['random_number']
+        if isinstance(random_number, int):
+            kwargs['bizz_fuzz'] = get_bizz_fuzz_category(random_number)
+            return super().update(**kwargs)
+        # an expression is only known once it has been written, so fix up
+        # the rows just updated whose category no longer matches. Every
+        # step runs on the database written to, self.db is a read alias.
+        db = self._db or router.db_for_write(self.model, **self._hints)
+        with transaction.atomic(using=db):
+            updated = self.model._base_manager.using(db)
+            marker = kwargs.get('updated_at')
+            if isinstance(marker, datetime.datetime):
+                # the indexed timestamp finds the updated rows again
+                updated = updated.filter(updated_at=marker)
+            else:
+                updated = updated.filter(pk__in=list(
+                    self.using(db).values_list('pk', flat=True)))
+            rows = super().update(**kwargs)
+            category = BizzFuzzCategory('random_number')
+            updated.exclude(bizz_fuzz=category).update(bizz_fuzz=category)
+        return rows
+
+    def with_eligibility(self, today=None):
+        """Annotate every user with an Allowed or Blocked eligibility."""
+        cutoff = get_eligibility_cutoff(today)
+        return self.annotate(eligible=models.Case(
+            models.When(birth_date__lte=cutoff,
+                        then=models.Value('Allowed')),
+            models.When(birth_date__gt=cutoff,
+                        then=models.Value('Blocked')),
+            default=models.Value(''),
+            output_field=models.CharField()))
+
+    def search(self, query):
+        """Filter users by word prefixes of their username, email or names.
+
+        On SQLite the users_customuser_fts full-text index answers it.
+        """
+        match = get_search_match(query)
+        if not match:
+            return self.none()
+        connection = connections[self.db]
+        if connection.vendor != 'sqlite':
+            lookups = models.Q()
+            for word in re.findall(r'\w+', query):
+                lookups &= (models.Q(username__istartswith=word)
+                            | models.Q(email__istartswith=word)
+                            | models.Q(first_name__istartswith=word)
+                            | models.Q(last_name__istartswith=word))
+            return self.filter(lookups)
+        # pk__in=RawSQL() would wrap the subquery in a second pair of
+        # parentheses, which SQLite reads as a scalar subquery
+        column = '{}.{}'.format(
+            connection.ops.quote_name(self.model._meta.db_table),
+            connection.ops.quote_name('id'))
+        return self.extra(
+            where=['{} IN (SELECT rowid FROM users_customuser_fts '
+                   'WHERE users_customuser_fts MATCH %s)'.format(column)],
+            params=[match])
+
+    def eligible(self, eligible, today=None):
+        """Filter users by an Allowed or Blocked eligibility."""
+        cutoff = get_eligibility_cutoff(today)
+        if eligible == 'Allowed':
+            return self.filter(birth_date__lte=cutoff)
+        elif eligible == 'Blocked':
+            return self.filter(birth_date__gt=cutoff)
+        raise ValueError('Unknown eligibility: {!r}'.format(eligible))
+
+
+class CustomUserManager(UserManager.from_queryset(CustomUserQuerySet)):
+    pass
+
+
 class CustomUser(AbstractUser):
     """Custom user model."""
 
     email = models.EmailField(unique=True, blank=False, max_length=70)
-    birth_date = models.DateField(null=True, blank=False)
+    birth_date = models.DateField(null=True, blank=False, db_index=True)
     random_number = models.IntegerField(default=generate_random_number)
+    # stored result of get_bizz_fuzz_category(random_number)
+    bizz_fuzz = models.CharField(max_length=8, blank=True, editable=False,
+                                 db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # set by user_delete, purge_deleted_users removes the row later on
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False,
+                                      db_index=True)
+
+    objects = CustomUserManager()
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # user_list and export_user_csv filter on both flags and
+            # walk the matching rows in primary key order
+            models.Index(fields=['is_active', 'is_staff', 'id'],
+                         name='users_active_staff_id_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.bizz_fuzz = get_bizz_fuzz_category(self.random_number)
+        update_fields = kwargs.get('update_fields')
+        if update_fields:
+            update_fields = set(update_fields) | {'updated_at'}
+            if 'random_number' in update_fields:
+                update_fields.add('bizz_fuzz')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
 
     def get_absolute_url(self):
         return reverse('user_details',
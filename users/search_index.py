@@ -0,0 +1,79 @@
+# The search index of migration 0007, whose statements are frozen in the
+# migration itself. These can be run again, the rebuild catches up with
+# any change made while the triggers were missing.
+CREATE_SEARCH_INDEX = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS users_customuser_fts USING fts5(
+        username, email, first_name, last_name,
+        content='users_customuser', content_rowid='id',
+        prefix='2 3 4'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_customuser_fts_insert
+    AFTER INSERT ON users_customuser BEGIN
+        INSERT INTO users_customuser_fts
+            (rowid, username, email, first_name, last_name)
+        VALUES (new.id, new.username, new.email, new.first_name,
+                new.last_name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_customuser_fts_delete
+    AFTER DELETE ON users_customuser BEGIN
+        INSERT INTO users_customuser_fts
+            (users_customuser_fts, rowid, username, email, first_name,
+             last_name)
+        VALUES ('delete', old.id, old.username, old.email, old.first_name,
+                old.last_name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_customuser_fts_update
+    AFTER UPDATE OF username, email, first_name, last_name
+    ON users_customuser BEGIN
+        INSERT INTO users_customuser_fts
+            (users_customuser_fts, rowid, username, email, first_name,
+             last_name)
+        VALUES ('delete', old.id, old.username, old.email, old.first_name,
+                old.last_name);
+        INSERT INTO users_customuser_fts
+            (rowid, username, email, first_name, last_name)
+        VALUES (new.id, new.username, new.email, new.first_name,
+                new.last_name);
+    END
+    """,
+    "INSERT INTO users_customuser_fts (users_customuser_fts) "
+    "VALUES ('rebuild')",
+]
+
+# the triggers are dropped whenever SQLite rebuilds users_customuser
+SEARCH_INDEX_TRIGGERS = (
+    'users_customuser_fts_insert',
+    'users_customuser_fts_delete',
+    'users_customuser_fts_update',
+)
+
+
+def restore_search_index(connection):
+    """Recreate the search index triggers if a table rebuild dropped them.
+
+    SQLite rebuilds the users table for most AlterField and AddField
+    operations, which drops its triggers but keeps the index, so the index
+    is rebuilt as well to take in the changes made in the meantime. Return
+    whether anything was restored.
+    """
+    if connection.vendor != 'sqlite':
+        return False
+    names = ('users_customuser_fts',) + SEARCH_INDEX_TRIGGERS
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT name FROM sqlite_master WHERE name IN ({})'.format(
+                ', '.join(['%s'] * len(names))), names)
+        existing = {row[0] for row in cursor.fetchall()}
+        # without the index, the migration creating it is not applied
+        if names[0] not in existing or existing.issuperset(names):
+            return False
+        for statement in CREATE_SEARCH_INDEX:
+            cursor.execute(statement)
+    return True
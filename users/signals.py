@@ -0,0 +1,8 @@
+from django.db import connections
+
+from .search_index import restore_search_index
+
+
+def restore_search_index_after_migrate(sender, using, **kwargs):
+    """Recreate the search index triggers dropped by a later migration."""
+    restore_search_index(connections[using])
@@ -1,8 +1,34 @@
+import collections
 import datetime
+import io
+import os
 import random
+import runpy
+import tempfile
+from unittest import mock
 
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.sessions.models import Session
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection
+from django.db.models import F, Max
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from management_tool.templatetags.eligible import calculate_age
+from user_management_app import settings as settings_module
+from .admin import EstimatedCountPaginator
+from .management.commands import bench_user_indexes
+from .forms import CustomUserChangeForm
+from .models import (RandomNumber, get_bizz_fuzz_category,
+                     get_eligibility_cutoff)
+from .search_index import SEARCH_INDEX_TRIGGERS
 
 User = get_user_model()
 
@@ -79,3 +105,419 @@ class CustomUserTest(TestCase):
         user = User.objects.get(id=1)
         field_label = user._meta.get_field('random_number').verbose_name
         self.assertEqual(field_label, 'random number')
+
+
+class BizzFuzzCategoryTest(TestCase):
+    """Test the stored BizzFuzz category."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='TestUser',
+                                             email='test@user.com',
+                                             password='foo',
+                                             birth_date=datetime.date.today(),
+                                             random_number=15)
+
+    def test_category_is_set_on_create(self):
+        self.assertEqual(self.user.bizz_fuzz, 'BizzFuzz')
+        self.assertEqual(User.objects.get(pk=self.user.pk).bizz_fuzz,
+                         'BizzFuzz')
+
+    def test_category_follows_change_form(self):
+        form = CustomUserChangeForm(instance=self.user,
+                                    data={'username': 'TestUser',
+                                          'birth_date': '2000-01-01',
+                                          'random_number': '9'})
+        self.assertTrue(form.is_valid())
+        form.save()
+        self.assertEqual(User.objects.get(pk=self.user.pk).bizz_fuzz, 'Bizz')
+
+    def test_category_follows_save_with_update_fields(self):
+        self.user.random_number = 10
+        self.user.save(update_fields=['random_number'])
+        self.assertEqual(User.objects.get(pk=self.user.pk).bizz_fuzz, 'Fuzz')
+
+    def test_category_follows_bulk_update_with_value(self):
+        User.objects.filter(pk=self.user.pk).update(random_number=7)
+        self.assertEqual(User.objects.get(pk=self.user.pk).bizz_fuzz, '')
+
+    def test_category_follows_bulk_update_with_expression(self):
+        rows = User.objects.filter(random_number=15).update(
+            random_number=F('random_number') + 3)
+        self.assertEqual(rows, 1)
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(user.random_number, 18)
+        self.assertEqual(user.bizz_fuzz, 'Bizz')
+
+    def test_bulk_update_touches_updated_at(self):
+        updated_at = self.user.updated_at
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertGreater(User.objects.get(pk=self.user.pk).updated_at,
+                           updated_at)
+
+    def test_category_is_set_on_bulk_create(self):
+        User.objects.bulk_create([
+            User(username='bulk{}'.format(n),
+                 email='bulk{}@user.com'.format(n),
+                 random_number=n)
+            for n in (3, 5, 30, 31)])
+        self.assertEqual(
+            dict(User.objects.filter(username__startswith='bulk')
+                 .values_list('random_number', 'bizz_fuzz')),
+            {3: 'Bizz', 5: 'Fuzz', 30: 'BizzFuzz', 31: ''})
+
+
+class EligibilityTest(TestCase):
+    """Test the SQL-side eligibility annotation and filter."""
+
+    @classmethod
+    def setUpTestData(cls):
+        today = datetime.date.today()
+        cutoff = get_eligibility_cutoff(today)
+        birth_dates = [today, cutoff, cutoff + datetime.timedelta(days=1),
+                       cutoff - datetime.timedelta(days=1),
+                       datetime.date(1955, 12, 1), None]
+        for n, birth_date in enumerate(birth_dates):
+            User.objects.create_user(username='user{}'.format(n),
+                                     email='user{}@user.com'.format(n),
+                                     password='foo',
+                                     birth_date=birth_date)
+
+    def test_cutoff(self):
+        self.assertEqual(get_eligibility_cutoff(datetime.date(2020, 3, 16)),
+                         datetime.date(2006, 3, 16))
+        self.assertEqual(get_eligibility_cutoff(datetime.date(2024, 2, 29)),
+                         datetime.date(2010, 2, 28))
+
+    def test_annotation_matches_calculate_age(self):
+        for user in User.objects.with_eligibility():
+            self.assertEqual(user.eligible, calculate_age(user.birth_date),
+                             msg=str(user.birth_date))
+
+    def test_filter_allowed_and_blocked(self):
+        self.assertEqual(
+            set(User.objects.eligible('Allowed')
+                .values_list('username', flat=True)),
+            {'user1', 'user3', 'user4'})
+        self.assertEqual(
+            set(User.objects.eligible('Blocked')
+                .values_list('username', flat=True)),
+            {'user0', 'user2'})
+
+    def test_filter_unknown_eligibility(self):
+        with self.assertRaises(ValueError):
+            User.objects.eligible('Maybe')
+
+
+class UserSearchTest(TestCase):
+    """Test the full-text user search."""
+
+    def setUp(self):
+        User.objects.create_user(username='john_lennon',
+                                 email='john@beatles.com', password='foo',
+                                 first_name='John', last_name='Lennon')
+        User.objects.create_user(username='paul', email='paul@wings.com',
+                                 password='foo', last_name='McCartney')
+
+    def search(self, query):
+        return sorted(User.objects.search(query).values_list('username',
+                                                             flat=True))
+
+    def test_search_by_prefix_of_any_column(self):
+        self.assertEqual(self.search('jo'), ['john_lennon'])
+        self.assertEqual(self.search('lenn'), ['john_lennon'])
+        self.assertEqual(self.search('mcc'), ['paul'])
+        self.assertEqual(self.search('wings'), ['paul'])
+
+    def test_search_requires_every_word(self):
+        self.assertEqual(self.search('paul wings'), ['paul'])
+        self.assertEqual(self.search('paul beatles'), [])
+
+    def test_search_ignores_query_syntax(self):
+        self.assertEqual(self.search('"jo*" OR'), [])
+        self.assertEqual(self.search('***'), [])
+
+    def test_search_index_follows_changes(self):
+        User.objects.filter(username='paul').update(email='paul@beatles.com')
+        self.assertEqual(self.search('beatles'), ['john_lennon', 'paul'])
+        User.objects.get(username='john_lennon').delete()
+        self.assertEqual(self.search('beatles'), ['paul'])
+        user = User.objects.get(username='paul')
+        user.username = 'macca'
+        user.save()
+        self.assertEqual(self.search('macca'), ['macca'])
+        self.assertEqual(self.search('paul'), ['macca'])
+
+    def test_search_index_is_restored_after_migrate(self):
+        # as a table rebuild by a later AlterField or AddField would
+        with connection.cursor() as cursor:
+            for trigger in SEARCH_INDEX_TRIGGERS:
+                cursor.execute('DROP TRIGGER {}'.format(trigger))
+        User.objects.filter(username='paul').update(email='paul@beatles.com')
+        self.assertEqual(self.search('beatles'), ['john_lennon'])
+        emit_post_migrate_signal(0, False, 'default')
+        self.assertEqual(self.search('beatles'), ['john_lennon', 'paul'])
+        User.objects.filter(username='paul').update(email='paul@wings.com')
+        self.assertEqual(self.search('beatles'), ['john_lennon'])
+
+
+class BenchUserIndexesCommandTest(TestCase):
+    """Test the user index benchmark command."""
+
+    def test_run_bench_reports_plans_and_restores_indexes(self):
+        out = io.StringIO()
+        command = bench_user_indexes.Command(stdout=out)
+        command.run_bench(50, 1)
+        output = out.getvalue()
+        self.assertIn('Seeded 50 users', output)
+        self.assertIn('Custom indexes: after', output)
+        with connection.cursor() as cursor:
+            indexes = connection.introspection.get_constraints(
+                cursor, User._meta.db_table)
+        for index in User._meta.indexes:
+            self.assertIn(index.name, indexes)
+
+
+class ImportUsersCommandTest(TestCase):
+    """Test the bulk user import command."""
+
+    def setUp(self):
+        User.objects.create_user(username='Lisa', email='lisa@user.com',
+                                 password='foo')
+        csv_file = tempfile.NamedTemporaryFile('w', suffix='.csv',
+                                               delete=False)
+        csv_file.write('Username,Birthday,Eligible,Random Number,BizzFuzz\n'
+                       'chris,15/01/2015,Blocked,15,BizzFuzz\n'
+                       'John,1985-02-12,Allowed,94,94\n'
+                       'Lisa,01/01/1990,Allowed,3,Bizz\n'
+                       'chris,15/01/2015,Blocked,15,BizzFuzz\n'
+                       'Mark,31/02/2000,Allowed,50,Fuzz\n'
+                       'Anna,22/04/1995,Allowed,many,Bizz\n')
+        csv_file.close()
+        self.path = csv_file.name
+        self.addCleanup(os.remove, self.path)
+
+    def call_command(self, **options):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_users', self.path, stdout=out, stderr=err,
+                     **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_valid_rows(self):
+        out, err = self.call_command(batch_size=1)
+        self.assertIn('Imported 2 users', out)
+        self.assertIn('rejected 4 rows', out)
+        chris = User.objects.get(username='chris')
+        self.assertEqual(chris.birth_date, datetime.date(2015, 1, 15))
+        self.assertEqual(chris.random_number, 15)
+        self.assertEqual(chris.bizz_fuzz, 'BizzFuzz')
+        self.assertEqual(chris.email, 'chris@users.invalid')
+        self.assertFalse(chris.has_usable_password())
+        self.assertEqual(User.objects.get(username='John').birth_date,
+                         datetime.date(1985, 2, 12))
+
+    def test_import_reports_rejected_rows(self):
+        out, err = self.call_command()
+        self.assertIn("Line 4: User 'Lisa' already exists.", err)
+        self.assertIn("Line 5: Duplicate username 'chris'.", err)
+        self.assertIn("Line 6: Invalid birthday '31/02/2000'.", err)
+        self.assertIn("Line 7: Invalid random number 'many'.", err)
+
+    def test_import_hashes_password(self):
+        self.call_command(password='Pw4Newuser', workers=1)
+        self.assertTrue(
+            User.objects.get(username='John').check_password('Pw4Newuser'))
+
+
+class PurgeSessionsCommandTest(TestCase):
+    """Test the batched expired session purge command."""
+
+    def setUp(self):
+        now = timezone.now()
+        for i in range(5):
+            Session.objects.create(
+                session_key='expired{}'.format(i), session_data='',
+                expire_date=now - datetime.timedelta(days=1))
+        Session.objects.create(session_key='active', session_data='',
+                               expire_date=now + datetime.timedelta(days=1))
+
+    def test_purge_deletes_expired_sessions_in_batches(self):
+        out = io.StringIO()
+        call_command('purge_sessions', batch_size=2, stdout=out)
+        self.assertIn('Deleted 5 expired sessions.', out.getvalue())
+        self.assertEqual(list(Session.objects.values_list('session_key',
+                                                          flat=True)),
+                         ['active'])
+
+    def test_purge_rejects_empty_batches(self):
+        with self.assertRaises(CommandError):
+            call_command('purge_sessions', batch_size=0)
+
+
+class CachedSessionTest(TestCase):
+    """Test logins with the cache backed session engines."""
+
+    def setUp(self):
+        User.objects.create_user(username='john', email='john@user.com',
+                                 password='johnpassword')
+
+    def test_cached_db_session_is_read_from_cache(self):
+        engine = 'django.contrib.sessions.backends.cached_db'
+        with self.settings(SESSION_ENGINE=engine):
+            self.client.login(username='john', password='johnpassword')
+            self.client.get('/users/')
+            with self.assertNumQueries(1):
+                # only the user is loaded, the session comes from the cache
+                response = self.client.get('/login/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Session.objects.exists())
+
+    def test_cache_modes_need_a_shared_cache(self):
+        for mode in ('cache', 'cached_db'):
+            with mock.patch.dict(os.environ, {'SESSION_MODE': mode}):
+                with self.assertRaises(ImproperlyConfigured):
+                    runpy.run_path(settings_module.__file__)
+        with mock.patch.dict(os.environ, {
+                'SESSION_MODE': 'cached_db',
+                'SESSION_CACHE_BACKEND': 'django.core.cache.backends.'
+                                         'memcached.MemcachedCache',
+                'SESSION_CACHE_LOCATION': '127.0.0.1:11211'}):
+            module = runpy.run_path(settings_module.__file__)
+        self.assertEqual(module['SESSION_ENGINE'],
+                         'django.contrib.sessions.backends.cached_db')
+        self.assertNotIn('OPTIONS', module['CACHES']['sessions'])
+
+    def test_cache_session_skips_the_database(self):
+        with self.settings(
+                SESSION_ENGINE='django.contrib.sessions.backends.cache'):
+            self.client.login(username='john', password='johnpassword')
+            response = self.client.get('/users/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Session.objects.exists())
+
+
+class PasswordHasherTest(TestCase):
+    """Test the configurable PBKDF2 password hasher."""
+
+    def test_iterations_follow_the_setting(self):
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            encoded = make_password('Pw4Newuser')
+        self.assertTrue(encoded.startswith('pbkdf2_sha256$1000$'))
+
+    def test_password_is_rehashed_when_iterations_change(self):
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            user = User.objects.create_user(username='john',
+                                            email='john@user.com',
+                                            password='johnpassword')
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertTrue(self.client.login(username='john',
+                                              password='johnpassword'))
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$2000$'))
+
+
+class CustomUserAdminTest(TestCase):
+    """Test the large table mode and bulk actions of the user admin."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            'admin', 'admin@user.com', 'adminpassword')
+        User.objects.bulk_create([
+            User(username='user{}'.format(i),
+                 email='user{}@user.com'.format(i), random_number=i)
+            for i in range(1, 11)])
+        self.client.login(username='admin', password='adminpassword')
+        self.url = reverse('admin:users_customuser_changelist')
+
+    def test_changelist_skips_exact_count(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'user10')
+        counts = [query['sql'] for query in context.captured_queries
+                  if 'COUNT(' in query['sql']]
+        self.assertEqual(counts, [])
+
+    def test_paginator_estimates_unfiltered_count(self):
+        User.objects.filter(username='user5').delete()
+        paginator = EstimatedCountPaginator(User.objects.order_by('pk'), 5)
+        self.assertEqual(paginator.count, User.objects.aggregate(
+            max_pk=Max('pk'))['max_pk'])
+        paginator = EstimatedCountPaginator(
+            User.objects.filter(is_superuser=False).order_by('pk'), 5)
+        self.assertEqual(paginator.count, 9)
+
+    def test_deactivate_action_keeps_own_account(self):
+        pks = list(User.objects.values_list('pk', flat=True))
+        self.client.post(self.url, {'action': 'deactivate_users',
+                                    '_selected_action': pks})
+        self.assertEqual(list(User.objects.filter(
+            is_active=True).values_list('username', flat=True)), ['admin'])
+
+    def test_regenerate_action_updates_categories(self):
+        pks = list(User.objects.values_list('pk', flat=True))
+        with CaptureQueriesContext(connection) as context:
+            self.client.post(self.url, {'action': 'regenerate_random_numbers',
+                                        '_selected_action': pks})
+        updates = [query['sql'] for query in context.captured_queries
+                   if query['sql'].startswith('UPDATE')]
+        # the numbers, then the categories that no longer match them
+        self.assertEqual(len(updates), 2)
+        self.assertIn('"updated_at" =', updates[1])
+        for user in User.objects.all():
+            self.assertTrue(1 <= user.random_number <= 100)
+            self.assertEqual(user.bizz_fuzz,
+                             get_bizz_fuzz_category(user.random_number))
+
+    def test_regenerate_leaves_other_users_alone(self):
+        # a stale category outside the selection is not the action's concern
+        User._base_manager.filter(username='user1').update(bizz_fuzz='Bizz')
+        pks = list(User.objects.exclude(username='user1').values_list(
+            'pk', flat=True))
+        self.client.post(self.url, {'action': 'regenerate_random_numbers',
+                                    '_selected_action': pks})
+        self.assertEqual(User.objects.get(username='user1').bizz_fuzz,
+                         'Bizz')
+
+    def test_random_numbers_are_uniform(self):
+        draws = User.objects.annotate(
+            number=RandomNumber()).values_list('number', flat=True)
+        counts = collections.Counter()
+        for i in range(2000):
+            # 11 users, so 22000 draws
+            counts.update(draws.all())
+        self.assertEqual(set(counts), set(range(1, 101)))
+        # about 220 each
+        self.assertGreater(min(counts.values()), 150)
+        self.assertLess(max(counts.values()), 300)
+
+
+class PurgeDeletedUsersCommandTest(TestCase):
+    """Test the batched purge of soft deleted users."""
+
+    def setUp(self):
+        now = timezone.now()
+        for i in range(5):
+            User.objects.create_user(
+                username='gone{}'.format(i), email='gone{}@user.com'.format(i),
+                is_active=False, deleted_at=now - datetime.timedelta(hours=i))
+        User.objects.create_user(username='inactive',
+                                 email='inactive@user.com', is_active=False)
+        User.objects.create_user(username='john', email='john@user.com')
+
+    def test_purge_deletes_soft_deleted_users_in_batches(self):
+        out = io.StringIO()
+        call_command('purge_deleted_users', batch_size=2, stdout=out)
+        self.assertIn('Purged 5 deleted users.', out.getvalue())
+        self.assertEqual(
+            sorted(User.objects.values_list('username', flat=True)),
+            ['inactive', 'john'])
+
+    def test_purge_keeps_recently_deleted_users(self):
+        call_command('purge_deleted_users', older_than=2 * 60 * 60,
+                     stdout=io.StringIO())
+        self.assertEqual(User.objects.filter(
+            username__startswith='gone').count(), 2)
+
+    def test_purge_rejects_empty_batches(self):
+        with self.assertRaises(CommandError):
+            call_command('purge_deleted_users', batch_size=0)